@@ -0,0 +1,336 @@
+# pip install pillow numpy
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+RESOLUTIONS = [(640, 480), (1280, 960), (2560, 1920)]
+NODE_COUNTS = [8, 32, 128]
+WORDS = ["v1", "v2", "G", "H", "K4", "x", "y", "root", "leaf", "A", "B", "C", "deg", "3", "7", "cut"]
+
+# ---------------------------------------------------------------- synthetic corpus
+
+def make_tikz(n_nodes, seed=0):
+    """A node-and-edge graph in the TikZ subset typical of the math.CO / cs.LG papers we crawl."""
+    rng = random.Random(seed * 1000 + n_nodes)
+    lines = ["\\begin{tikzpicture}"]
+    radius = max(2.0, n_nodes / 6)
+    for i in range(n_nodes):
+        angle = 2 * math.pi * i / n_nodes
+        x, y = radius * math.cos(angle), radius * math.sin(angle)
+        style = rng.choice(["circle,draw", "circle,draw,fill=white", "draw"])
+        lines.append(f"  \\node[{style}] (n{i}) at ({x:.2f},{y:.2f}) {{{rng.choice(WORDS)}}};")
+    for i in range(n_nodes):
+        for j in rng.sample(range(n_nodes), k=min(2, n_nodes - 1)):
+            if j != i:
+                lines.append(f"  \\draw (n{i}) -- (n{j});")
+    lines.append("\\end{tikzpicture}")
+    return "\n".join(lines)
+
+def make_paper_tex(n_figures, seed=0):
+    """A fake main .tex with many tikzpictures between prose, for extract_figures."""
+    rng = random.Random(seed)
+    body = []
+    for i in range(n_figures):
+        body.append("Lorem ipsum dolor sit amet. " * rng.randint(5, 40))
+        body.append("\\begin{figure}\n" + make_tikz(rng.choice(NODE_COUNTS), seed + i) + "\n\\end{figure}")
+    return ("\\documentclass{article}\n\\usepackage{tikz}\n\\begin{document}\n"
+            + "\n".join(body) + "\n\\end{document}\n")
+
+def make_fixture(width, height, seed=0):
+    """Synthetic clean render: words, circles and edges on white, plus pdf2png-style word boxes and a text mask."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed * 7919 + width)
+    img = Image.new("RGB", (width, height), "white")
+    mask = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(img)
+    mdraw = ImageDraw.Draw(mask)
+    font = ImageFont.load_default()
+    words = []
+    n = max(4, width * height // 40000)
+    centers = [(rng.randint(40, width - 40), rng.randint(40, height - 40)) for _ in range(n)]
+    for (x1, y1), (x2, y2) in zip(centers, centers[1:]):
+        draw.line((x1, y1, x2, y2), fill="black", width=2)
+    for i, (x, y) in enumerate(centers):
+        r = rng.randint(14, 30)
+        draw.ellipse((x - r, y - r, x + r, y + r), outline="black", fill="white", width=2)
+        text = rng.choice(WORDS)
+        draw.text((x - r // 2, y - 6), text, fill="black", font=font)
+        # Pad like real word boxes so every crop is at least SSIM's 7 px window
+        x0, y0, x1, y1 = draw.textbbox((x - r // 2, y - 6), text, font=font)
+        bbox = (max(0, x0 - 4), max(0, y0 - 4), min(width, x1 + 4), min(height, y1 + 4))
+        mdraw.rectangle((x0, y0, x1, y1), fill=255)
+        words.append({"text": text, "bbox": list(bbox), "block": 0, "line": i, "word_num": 0})
+    return img, words, mask
+
+# ---------------------------------------------------------------- benchmarks
+
+BENCHMARKS = []
+
+class Skip(Exception):
+    pass
+
+def benchmark(name):
+    """Register `setup(tmp) -> zero-arg callable`; only the callable is timed."""
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+def _require_tool(tool):
+    if shutil.which(tool) is None:
+        raise Skip(f"{tool} not on PATH")
+
+def _import(module):
+    try:
+        return __import__(module)
+    except ImportError as e:
+        raise Skip(f"cannot import {module}: {e}")
+
+for n_figures in (10, 100):
+    @benchmark(f"identify.extract_figures[{n_figures} figures]")
+    def _(tmp, n_figures=n_figures):
+        identify = _import("identify")
+        tex = tmp / "main.tex"
+        tex.write_text(make_paper_tex(n_figures))
+        out = tmp / "diagrams"
+        out.mkdir()
+        return lambda: identify.extract_figures(tex, out)
+
+for n_nodes in NODE_COUNTS:
+    @benchmark(f"render.compile_tex[{n_nodes} nodes]")
+    def _(tmp, n_nodes=n_nodes):
+        _require_tool("pdflatex")
+        render = _import("render")
+        tex = tmp / f"diag_{n_nodes}.tex"
+        tex.write_text("\\documentclass{standalone}\n\\usepackage{tikz}\n\\begin{document}\n"
+                       + make_tikz(n_nodes) + "\n\\end{document}\n")
+        return lambda: render.compile_tex(tex, tmp, enable_svg=False, enable_png=False)
+
+    @benchmark(f"pdf2png.process_pdf[{n_nodes} nodes]")
+    def _(tmp, n_nodes=n_nodes):
+        _require_tool("pdflatex")
+        _require_tool("pdftoppm")
+        render = _import("render")
+        pdf2png = _import("pdf2png")
+        tex = tmp / f"diag_{n_nodes}.tex"
+        tex.write_text("\\documentclass{standalone}\n\\usepackage{tikz}\n\\begin{document}\n"
+                       + make_tikz(n_nodes) + "\n\\end{document}\n")
+        if not render.compile_tex(tex, tmp, enable_svg=False, enable_png=False):
+            raise Skip("pdflatex failed on the synthetic diagram")
+        pdf = tex.with_suffix(".pdf")
+        out = tmp / "images"
+        out.mkdir()
+        return lambda: pdf2png.process_pdf(pdf, out, pdf.stem)
+
+for width, height in RESOLUTIONS:
+    res = f"{width}x{height}"
+
+    @benchmark(f"split.apply_soft_mask[{res}]")
+    def _(tmp, width=width, height=height):
+        split = _import("split")
+        img, _, mask = make_fixture(width, height)
+        return lambda: split.apply_soft_mask(img, mask)
+
+    @benchmark(f"degrademaker.degrade_image[{res}]")
+    def _(tmp, width=width, height=height):
+        degrademaker = _import("degrademaker")
+        img, _, _ = make_fixture(width, height)
+        return lambda: degrademaker.degrade_image(img, 2, 25)
+
+    @benchmark(f"blurmaker.blur_image[{res}]")
+    def _(tmp, width=width, height=height):
+        blurmaker = _import("blurmaker")
+        img, _, _ = make_fixture(width, height)
+        return lambda: blurmaker.blur_image(img, 2.5)
+
+    @benchmark(f"evaluate.compute_box_metrics[{res}]")
+    def _(tmp, width=width, height=height):
+        import numpy as np
+        evaluate = _import("evaluate")
+        degrademaker = _import("degrademaker")
+        img, words, _ = make_fixture(width, height)
+        gt = np.asarray(img)
+        pred = np.asarray(degrademaker.degrade_image(img, 1, 25))
+        boxes = [tuple(map(int, w["bbox"])) for w in words]
+        return lambda: evaluate.compute_box_metrics(gt, pred, boxes, None, True, True, False)
+
+# ---------------------------------------------------------------- runner
+
+def _rss_bytes():
+    """Current resident set size (Linux only; None elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def measure_memory(fn, interval=0.001):
+    """Peak tracemalloc size and peak RSS growth during one call.
+
+    tracemalloc only sees Python and numpy allocations; Pillow's image
+    buffers show up in the RSS figure only.
+    """
+    base = _rss_bytes()
+    peak_rss = [base]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            rss = _rss_bytes()
+            if rss is not None and rss > peak_rss[0]:
+                peak_rss[0] = rss
+            done.wait(interval)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    if base is not None:
+        sampler.start()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        done.set()
+    if base is not None:
+        sampler.join()
+    rss_delta = None if base is None else round((peak_rss[0] - base) / (1 << 20), 3)
+    return round(peak / (1 << 20), 3), rss_delta
+
+def run_one(setup, repeat, warmup):
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull, \
+         contextlib.redirect_stdout(devnull):
+        fn = setup(Path(tmp))
+        for _ in range(warmup):
+            fn()
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "repeat": repeat,
+    }
+
+def memory_one(setup):
+    """First call of a fresh setup, measured before any warmup so the allocator has no pages to reuse."""
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull, \
+         contextlib.redirect_stdout(devnull):
+        fn = setup(Path(tmp))
+        return measure_memory(fn)
+
+def measure_in_subprocess(name):
+    """Run memory_one in a fresh interpreter so earlier benchmarks cannot hide allocations."""
+    result = subprocess.run([sys.executable, str(Path(__file__).resolve()), "--memory_of", name],
+                            capture_output=True, text=True)
+    try:
+        peak_mem, rss_delta = json.loads(result.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return None, None
+    return peak_mem, rss_delta
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline, threshold):
+    """Print per-benchmark ratios against a baseline. Returns the names that regressed."""
+    regressions = []
+    print(f"\n{'benchmark':<48} {'base s':>9} {'now s':>9} {'ratio':>7}")
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base or "median_s" not in base or "median_s" not in res:
+            continue
+        ratio = res["median_s"] / max(base["median_s"], 1e-12)
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  [!] slower"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  [OK] faster"
+        print(f"{name:<48} {base['median_s']:>9.4f} {res['median_s']:>9.4f} {ratio:>7.2f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage's hot function on a synthetic corpus")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per benchmark")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs before timing")
+    parser.add_argument("--output", default="bench_results.json", help="Where to store results as JSON")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown of the median that counts as a regression")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    parser.add_argument("--memory_of", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Import stage modules from this folder regardless of the working directory
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+    if args.memory_of:
+        # Child process of measure_in_subprocess
+        setup = dict(BENCHMARKS)[args.memory_of]
+        print(json.dumps(memory_one(setup)))
+        return
+
+    selected = [(n, s) for n, s in BENCHMARKS if not args.filter or args.filter in n]
+    if args.list:
+        for name, _ in selected:
+            print(name)
+        return
+
+    results = {}
+    for name, setup in selected:
+        try:
+            results[name] = r = run_one(setup, args.repeat, args.warmup)
+            r["peak_mem_mb"], r["peak_rss_delta_mb"] = measure_in_subprocess(name)
+            traced = f", {r['peak_mem_mb']:.1f} MB traced" if r["peak_mem_mb"] is not None else ""
+            rss = f", +{r['peak_rss_delta_mb']:.1f} MB RSS" if r["peak_rss_delta_mb"] is not None else ""
+            print(f"[OK] {name:<48} {r['median_s']:.4f}s median{traced}{rss}")
+        except (Skip, ImportError) as e:
+            results[name] = {"skipped": str(e)}
+            print(f"[-] {name:<48} skipped: {e}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[OK] Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n[!] {len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
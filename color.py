@@ -1,20 +1,22 @@
 import re
 import subprocess
 from pathlib import Path
+import numpy as np
+from PIL import Image
+from tracing import get_tracer
 
 # Setup paths
 DIAGRAM_DIR = Path("diagrams")
 MASK_DIR = Path("masks")
 RENDER_DIR = Path("mask_renders")
-MASK_DIR.mkdir(exist_ok=True)
-RENDER_DIR.mkdir(exist_ok=True)
 
 # Helper to color only node contents
 def color_node_content(match):
     pre, content = match.group(1), match.group(2)
     return f"{pre}{{\\textcolor{{red}}{{{content}}}}}"
 
-for tex_file in DIAGRAM_DIR.glob("*.tex"):
+def make_mask(tex_file, mask_dir=MASK_DIR, render_dir=RENDER_DIR):
+    """Write, compile and rasterize the red-text mask variant of one diagram. Returns True on success."""
     text = tex_file.read_text()
 
     # Color the text inside nodes
@@ -33,7 +35,7 @@ for tex_file in DIAGRAM_DIR.glob("*.tex"):
         "\\end{document}"
     )
 
-    out_path = MASK_DIR / tex_file.name
+    out_path = mask_dir / tex_file.name
     out_path.write_text(wrapped)
     print(f"[OK] Created masked tex: {out_path.name}")
 
@@ -42,20 +44,20 @@ for tex_file in DIAGRAM_DIR.glob("*.tex"):
         subprocess.run([
             "pdflatex",
             "-interaction=nonstopmode",
-            "-output-directory", MASK_DIR.as_posix(),
+            "-output-directory", mask_dir.as_posix(),
             out_path.as_posix()
         ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except Exception as e:
         print(f"[!] pdflatex failed: {e}")
-        continue
+        return False
 
     pdf_path = out_path.with_suffix(".pdf")
     if not pdf_path.exists():
         print(f"[!] PDF not generated: {pdf_path.name}")
-        continue
+        return False
 
     # Convert PDF to PNG
-    png_path = RENDER_DIR / pdf_path.with_suffix(".png").name
+    png_path = render_dir / pdf_path.with_suffix(".png").name
     try:
         subprocess.run([
             "convert", "-density", "300",
@@ -66,3 +68,24 @@ for tex_file in DIAGRAM_DIR.glob("*.tex"):
         print(f"[OK] Rendered mask PNG: {png_path.name}")
     except Exception as e:
         print(f"[!] convert failed: {e}")
+        return False
+
+    return True
+
+def text_mask(render):
+    """L mask of the red node text in a make_mask render; anti-aliased edges stay partial."""
+    rgb = np.asarray(render.convert("RGB"), dtype=np.int16)
+    redness = rgb[..., 0] - np.maximum(rgb[..., 1], rgb[..., 2])
+    return Image.fromarray(np.clip(redness, 0, 255).astype(np.uint8), mode="L")
+
+if __name__ == "__main__":
+    MASK_DIR.mkdir(exist_ok=True)
+    RENDER_DIR.mkdir(exist_ok=True)
+    tracer = get_tracer("mask")
+
+    for tex_file in DIAGRAM_DIR.glob("*.tex"):
+        with tracer.item(tex_file.stem, inputs=[tex_file]) as ev:
+            if make_mask(tex_file):
+                ev.outputs = [RENDER_DIR / tex_file.with_suffix(".png").name]
+            else:
+                ev.fail("MaskRenderError")
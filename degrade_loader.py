@@ -0,0 +1,214 @@
+# pip install pillow numpy
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import random
+import time
+from collections import deque
+from itertools import islice
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+from degrademaker import sample_degrade_params, degrade_image
+from blurmaker import sample_blur_radius, blur_image
+
+# pdf2png.py (and fastrender.py) store word boxes in PDF points; renders are 300 dpi
+PDF_BOX_SCALE = 300 / 72
+
+class DirSource:
+    """Clean renders from a folder of PNGs with bbox JSONs alongside (or in box_dir)."""
+
+    def __init__(self, image_dir, box_dir=None):
+        self.image_dir = Path(image_dir)
+        self.box_dir = Path(box_dir) if box_dir else self.image_dir
+        self.keys = sorted(p.stem for p in self.image_dir.glob("*.png"))
+
+    def load(self, key):
+        image = Image.open(self.image_dir / f"{key}.png").convert("RGB")
+        box_path = self.box_dir / f"{key}.json"
+        words = json.loads(box_path.read_text(encoding="utf-8")) if box_path.exists() else []
+        return image, words
+
+class ShardSource:
+    """Clean renders and bboxes read from shards.py output."""
+
+    def __init__(self, index_path):
+        from shards import ShardReader
+        self.reader = ShardReader(index_path)
+        self.keys = [k for k in self.reader.keys if "clean.png" in self.reader.fields(k)]
+
+    def load(self, key):
+        image = Image.open(self.reader.open(key, "clean.png")).convert("RGB")
+        words = json.loads(self.reader.read(key, "bbox.json")) if "bbox.json" in self.reader.fields(key) else []
+        return image, words
+
+def sample_seed(seed, key, epoch):
+    """Seed depends only on (seed, image, epoch), never on worker id or order."""
+    return int(hashlib.sha256(f"{seed}:{key}:{epoch}".encode()).hexdigest()[:16], 16)
+
+class PairedDegradationDataset:
+    """Clean/degraded pairs generated lazily from clean renders.
+
+    Each sample draws a fresh corruption with the same operators and parameter
+    ranges as degrademaker.py ("jpeg": repeated JPEG + 2x nearest resize) and
+    blurmaker.py ("blur": Gaussian blur), so no degraded copy is stored on disk.
+    Indexing is map-style, so the dataset also plugs into a torch DataLoader;
+    call set_epoch() before each epoch (with non-persistent workers).
+    """
+
+    def __init__(self, source, ops=("jpeg", "blur"), crop_size=256, text_bias=0.8,
+                 box_scale=PDF_BOX_SCALE, seed=0):
+        self.source = source
+        self.ops = list(ops)
+        self.crop_size = crop_size
+        self.text_bias = text_bias
+        # bbox JSON units -> pixels; use 1.0 for boxes already in pixels
+        self.box_scale = box_scale
+        self.seed = seed
+        self.epoch = 0
+
+    def __len__(self):
+        return len(self.source.keys)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __getitem__(self, idx):
+        return self.get(idx, self.epoch)
+
+    def _pick_crop(self, rng, w, h, boxes):
+        cs = self.crop_size
+        if not cs or (w <= cs and h <= cs):
+            return 0, 0, w, h
+        cw, ch = min(cs, w), min(cs, h)
+        if len(boxes) and rng.random() < self.text_bias:
+            # Centre the crop on a random word, jittered by up to a quarter crop
+            x1, y1, x2, y2 = boxes[rng.randrange(len(boxes))]
+            cx = (x1 + x2) / 2 + rng.uniform(-cw / 4, cw / 4)
+            cy = (y1 + y2) / 2 + rng.uniform(-ch / 4, ch / 4)
+            left, top = int(cx - cw / 2), int(cy - ch / 2)
+        else:
+            left, top = rng.randint(0, w - cw), rng.randint(0, h - ch)
+        # Keep crops on the 8 px JPEG block grid so artifacts match full-image degradation
+        left = min(max(left, 0), w - cw) // 8 * 8
+        top = min(max(top, 0), h - ch) // 8 * 8
+        return left, top, left + cw, top + ch
+
+    def get(self, idx, epoch):
+        key = self.source.keys[idx]
+        rng = random.Random(sample_seed(self.seed, key, epoch))
+        image, words = self.source.load(key)
+
+        boxes = np.array([[c * self.box_scale for c in word["bbox"]] for word in words],
+                         dtype=np.float32).reshape(-1, 4)
+        crop = self._pick_crop(rng, image.width, image.height, boxes)
+        clean = image.crop(crop)
+
+        op = rng.choice(self.ops)
+        if op == "jpeg":
+            rounds, quality = sample_degrade_params(rng)
+            degraded = degrade_image(clean, rounds, quality)
+            params = {"op": op, "rounds": rounds, "jpeg_quality": quality}
+        elif op == "blur":
+            radius = sample_blur_radius(rng)
+            degraded = blur_image(clean, radius)
+            params = {"op": op, "blur_radius": radius}
+        else:
+            raise ValueError(f"Unknown degradation op: {op}")
+
+        # Shift boxes into crop coordinates and drop the ones that fall outside
+        left, top, right, bottom = crop
+        boxes = boxes - np.array([left, top, left, top], dtype=np.float32)
+        boxes = np.clip(boxes, 0, [right - left, bottom - top, right - left, bottom - top])
+        boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])].astype(np.int32)
+
+        return {
+            "key": key,
+            "epoch": epoch,
+            "crop": crop,
+            "clean": np.asarray(clean, dtype=np.uint8),
+            "degraded": np.asarray(degraded.convert("RGB"), dtype=np.uint8),
+            "boxes": boxes,
+            "params": params,
+        }
+
+_worker_dataset = None
+
+def _init_worker(dataset):
+    global _worker_dataset
+    _worker_dataset = dataset
+
+def _load(task):
+    idx, epoch = task
+    return _worker_dataset.get(idx, epoch)
+
+def iterate(dataset, epoch=0, shuffle=True, workers=0, prefetch=4):
+    """Yield one epoch of samples, decoded and degraded up to `prefetch` per worker ahead of use.
+
+    The epoch and per-sample seed travel with each task, so output is identical
+    for any number of workers.
+    """
+    order = list(range(len(dataset)))
+    if shuffle:
+        random.Random(sample_seed(dataset.seed, "order", epoch)).shuffle(order)
+    tasks = [(idx, epoch) for idx in order]
+
+    if workers <= 0:
+        for task in tasks:
+            yield dataset.get(*task)
+        return
+
+    with mp.Pool(workers, initializer=_init_worker, initargs=(dataset,)) as pool:
+        # At most workers * prefetch samples in flight, refilled as the consumer takes them
+        pending = deque()
+        task_iter = iter(tasks)
+        for task in islice(task_iter, workers * max(1, prefetch)):
+            pending.append(pool.apply_async(_load, (task,)))
+        while pending:
+            sample = pending.popleft().get()
+            for task in islice(task_iter, 1):
+                pending.append(pool.apply_async(_load, (task,)))
+            yield sample
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Preview / benchmark on-the-fly degraded pairs from clean renders")
+    parser.add_argument("--image_dir", default="./images", help="Clean PNGs (+ bbox JSONs)")
+    parser.add_argument("--box_dir", default=None, help="Bbox JSON folder if not next to the PNGs")
+    parser.add_argument("--shards", default=None, help="Read from a shards.py index.json instead")
+    parser.add_argument("--ops", nargs="+", default=["jpeg", "blur"], choices=["jpeg", "blur"])
+    parser.add_argument("--crop_size", type=int, default=256, help="0 keeps whole images")
+    parser.add_argument("--text_bias", type=float, default=0.8, help="Probability a crop is centred on a word box")
+    parser.add_argument("--box_scale", type=float, default=PDF_BOX_SCALE,
+                        help="Multiply bbox coordinates by this (default: PDF points -> 300 dpi pixels)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=0, help="Stop each epoch after N samples")
+    parser.add_argument("--save_dir", default=None, help="Save *_clean.png / *_degraded.png pairs here")
+    args = parser.parse_args()
+
+    source = ShardSource(args.shards) if args.shards else DirSource(args.image_dir, args.box_dir)
+    dataset = PairedDegradationDataset(source, args.ops, args.crop_size, args.text_bias,
+                                       args.box_scale, args.seed)
+    save_dir = Path(args.save_dir) if args.save_dir else None
+    if save_dir:
+        save_dir.mkdir(parents=True, exist_ok=True)
+
+    for epoch in range(args.epochs):
+        start, count = time.perf_counter(), 0
+        for sample in iterate(dataset, epoch, workers=args.workers):
+            count += 1
+            if save_dir:
+                stem = f"{sample['key']}_e{epoch}"
+                Image.fromarray(sample["clean"]).save(save_dir / f"{stem}_clean.png")
+                Image.fromarray(sample["degraded"]).save(save_dir / f"{stem}_degraded.png")
+            if args.limit and count >= args.limit:
+                break
+        elapsed = time.perf_counter() - start
+        print(f"[OK] Epoch {epoch}: {count} samples in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.1f} samples/s)")
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ import csv
 import io
 from pathlib import Path
 from PIL import Image
+from tracing import get_tracer
 
 input_dir = "images"
 output_original_dir = "original"
@@ -12,50 +13,63 @@ output_bbox_dir = "bboxes"
 output_degraded_dir = "degraded"
 degrade_log_path = "degrade_log.csv"
 
-os.makedirs(output_original_dir, exist_ok=True)
-os.makedirs(output_bbox_dir, exist_ok=True)
-os.makedirs(output_degraded_dir, exist_ok=True)
+def sample_degrade_params(rng=random):
+    """Draw (rounds, jpeg_quality) the same way for every caller."""
+    return rng.randint(1, 3), rng.randint(20, 30)
 
-degrade_log = []
+def degrade_image(image, degrade_rounds, degrade_quality):
+    """Repeated JPEG compression + 2x nearest down/up-sampling."""
+    image = image.convert("RGB")
 
-for file_name in os.listdir(input_dir):
-    ext = file_name.lower().split(".")[-1]
-    name_stem = Path(file_name).stem
-    input_path = os.path.join(input_dir, file_name)
+    for _ in range(degrade_rounds):
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=degrade_quality)
+        buffer.seek(0)
+        image = Image.open(buffer)
 
-    if ext == "png":
-        shutil.copy(input_path, os.path.join(output_original_dir, file_name))
+        w, h = image.size
+        image = image.resize((w // 2, h // 2), Image.NEAREST)
+        image = image.resize((w, h), Image.NEAREST)
 
-        degrade_rounds = random.randint(1, 3)
-        degrade_quality = random.randint(20, 30)
+    return image
 
-        image = Image.open(input_path).convert("RGB")
+if __name__ == "__main__":
+    os.makedirs(output_original_dir, exist_ok=True)
+    os.makedirs(output_bbox_dir, exist_ok=True)
+    os.makedirs(output_degraded_dir, exist_ok=True)
 
-        for _ in range(degrade_rounds):
-            buffer = io.BytesIO()
-            image.save(buffer, format="JPEG", quality=degrade_quality)
-            buffer.seek(0)
-            image = Image.open(buffer)
+    degrade_log = []
+    tracer = get_tracer("degrade")
 
-            w, h = image.size
-            image = image.resize((w // 2, h // 2), Image.NEAREST)
-            image = image.resize((w, h), Image.NEAREST)
+    for file_name in os.listdir(input_dir):
+        ext = file_name.lower().split(".")[-1]
+        name_stem = Path(file_name).stem
+        input_path = os.path.join(input_dir, file_name)
 
-        output_path = os.path.join(output_degraded_dir, file_name)
-        image.save(output_path, format="PNG")
+        if ext == "png":
+            with tracer.item(file_name, inputs=[input_path]) as ev:
+                shutil.copy(input_path, os.path.join(output_original_dir, file_name))
 
-        degrade_log.append({
-            "filename": file_name,
-            "rounds": degrade_rounds,
-            "jpeg_quality": degrade_quality
-        })
+                degrade_rounds, degrade_quality = sample_degrade_params()
+                image = degrade_image(Image.open(input_path), degrade_rounds, degrade_quality)
 
-    elif ext == "json":
-        shutil.copy(input_path, os.path.join(output_bbox_dir, file_name))
+                output_path = os.path.join(output_degraded_dir, file_name)
+                image.save(output_path, format="PNG")
+                ev.outputs = [output_path]
+                ev.extra.update(rounds=degrade_rounds, jpeg_quality=degrade_quality)
 
-with open(degrade_log_path, mode="w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=["filename", "rounds", "jpeg_quality"])
-    writer.writeheader()
-    writer.writerows(degrade_log)
+            degrade_log.append({
+                "filename": file_name,
+                "rounds": degrade_rounds,
+                "jpeg_quality": degrade_quality
+            })
 
-print(f"Processed {len(degrade_log)} images.")
\ No newline at end of file
+        elif ext == "json":
+            shutil.copy(input_path, os.path.join(output_bbox_dir, file_name))
+
+    with open(degrade_log_path, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["filename", "rounds", "jpeg_quality"])
+        writer.writeheader()
+        writer.writerows(degrade_log)
+
+    print(f"Processed {len(degrade_log)} images.")
@@ -4,14 +4,12 @@ import csv
 from glob import glob
 from PIL import Image
 import numpy as np
-import torch
-import lpips
-import cv2
 from skimage.metrics import peak_signal_noise_ratio, structural_similarity
-import easyocr
 from tqdm import tqdm
 import json
 import difflib
+from pathlib import Path
+from tracing import get_tracer
 
 def load_image(path):
     return np.array(Image.open(path).convert('RGB'))
@@ -25,6 +23,7 @@ def compute_global_metrics(gt, pred, lpips_model=None, use_psnr=True, use_ssim=T
         ssim = structural_similarity(gt, pred, channel_axis=2, data_range=255)
         results["ssim"] = ssim
     if use_lpips and lpips_model is not None:
+        import torch
         t_gt = torch.tensor(gt).permute(2,0,1).unsqueeze(0).float() / 255 * 2 - 1
         t_pred = torch.tensor(pred).permute(2,0,1).unsqueeze(0).float() / 255 * 2 - 1
         if torch.cuda.is_available():
@@ -48,6 +47,7 @@ def compute_box_metrics(gt, pred, boxes, lpips_model=None, use_psnr=True, use_ss
         if use_ssim:
             ssims.append(structural_similarity(gt_crop, pred_crop, channel_axis=2, data_range=255))
         if use_lpips and lpips_model is not None:
+            import torch
             t_gt = torch.tensor(gt_crop).permute(2,0,1).unsqueeze(0).float() / 255 * 2 - 1
             t_pred = torch.tensor(pred_crop).permute(2,0,1).unsqueeze(0).float() / 255 * 2 - 1
             if torch.cuda.is_available():
@@ -80,8 +80,11 @@ def levenshtein_accuracy(pred, gt):
     return sm.ratio()
 
 def parse_boxes_json(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    if hasattr(path, 'read'):
+        data = json.load(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
     boxes, texts = [], []
     for item in data:
         x1, y1, x2, y2 = map(int, item['bbox'])
@@ -90,67 +93,319 @@ def parse_boxes_json(path):
     return boxes, texts
 
 def get_lpips_model(model_name='alex'):
+    # torch and lpips are only needed for --lpips; PSNR/SSIM run without them
+    import torch
+    import lpips
     model = lpips.LPIPS(net=model_name)
     if torch.cuda.is_available():
         model = model.cuda()
     return model
 
+def build_pairs(gt_dir, pred_dir, box_dir, manifest=None):
+    """Pair GT / prediction / bbox files by stem instead of by sort order.
+
+    Returns (pairs, missing) where pairs is a list of (name, gt, pred, box)
+    and missing is a list of (name, reason) for stems that cannot be paired.
+    """
+    if manifest:
+        # Manifest: one stem per row in a `name` column, optional explicit paths
+        with open(manifest, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        entries = [(
+            r['name'],
+            r.get('gt') or os.path.join(gt_dir, r['name'] + ".png"),
+            r.get('pred') or os.path.join(pred_dir, r['name'] + ".png"),
+            r.get('box') or os.path.join(box_dir, r['name'] + ".json"),
+        ) for r in rows]
+    else:
+        gt_stems = {Path(p).stem for p in glob(os.path.join(gt_dir, "*.png"))}
+        pred_stems = {Path(p).stem for p in glob(os.path.join(pred_dir, "*.png"))}
+        entries = [(
+            name,
+            os.path.join(gt_dir, name + ".png"),
+            os.path.join(pred_dir, name + ".png"),
+            os.path.join(box_dir, name + ".json"),
+        ) for name in sorted(gt_stems | pred_stems)]
+
+    pairs, missing = [], []
+    for name, gt_path, pred_path, box_path in entries:
+        if not os.path.exists(gt_path):
+            missing.append((name, "gt"))
+        elif not os.path.exists(pred_path):
+            missing.append((name, "pred"))
+        elif not os.path.exists(box_path):
+            missing.append((name, "box"))
+        else:
+            pairs.append((name, gt_path, pred_path, box_path))
+    return pairs, missing
+
+def build_shard_pairs(reader, pred_dir=None, pred_field=None, manifest=None):
+    """Like build_pairs, but GT images and boxes come from a ShardReader.
+
+    Predictions are read from pred_dir, or from another shard field
+    (e.g. 'degraded.png') when pred_field is given. Sources are returned as
+    callables so nothing is read before the image is evaluated.
+    """
+    if manifest:
+        with open(manifest, newline='', encoding='utf-8') as f:
+            names = [r['name'] for r in csv.DictReader(f)]
+    else:
+        names = sorted(reader.keys)
+
+    pairs, missing = [], []
+    for name in names:
+        if name not in reader or 'clean.png' not in reader.fields(name):
+            missing.append((name, "gt"))
+            continue
+        if 'bbox.json' not in reader.fields(name):
+            missing.append((name, "box"))
+            continue
+        if pred_field:
+            if pred_field not in reader.fields(name):
+                missing.append((name, "pred"))
+                continue
+            pred = (lambda n=name: reader.open(n, pred_field))
+        else:
+            pred = os.path.join(pred_dir, name + ".png")
+            if not os.path.exists(pred):
+                missing.append((name, "pred"))
+                continue
+        pairs.append((
+            name,
+            lambda n=name: reader.open(n, 'clean.png'),
+            pred,
+            lambda n=name: reader.open(n, 'bbox.json'),
+        ))
+    return pairs, missing
+
+def resolve_source(src):
+    """A pair entry is either a path or a callable returning a file object."""
+    return src() if callable(src) else src
+
+def drop_partial_rows(path):
+    """Cut a torn last line and trailing rows whose column count differs from the header.
+
+    A run killed mid-write leaves a partial row; appending after it would glue
+    the next row onto the same line. Returns the number of rows dropped.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, newline='', encoding='utf-8') as f:
+        text = f.read()
+    keep = text if text.endswith('\n') else text[:text.rfind('\n') + 1]
+    rows = list(csv.reader(keep.splitlines(keepends=True)))
+    dropped = int(keep != text)
+    while len(rows) > 1 and len(rows[-1]) != len(rows[0]):
+        rows.pop()
+        dropped += 1
+    if dropped:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+    return dropped
+
+def read_done_names(output_csv):
+    """Header and names already present in a previous (possibly interrupted) run."""
+    if not os.path.exists(output_csv):
+        return None, set()
+    with open(output_csv, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        return header, {row[0] for row in reader if row}
+
+def read_header(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), None)
+
+def result_headers(args):
+    """Per-image and per-box CSV columns for the selected metrics."""
+    headers = ['name']
+    if args.psnr: headers += ['global_psnr']
+    if args.ssim: headers += ['global_ssim']
+    if args.lpips: headers += ['global_lpips']
+    headers += ['num_boxes']
+    if args.psnr: headers += ['box_psnr_mean']
+    if args.ssim: headers += ['box_ssim_mean']
+    if args.lpips: headers += ['box_lpips_mean']
+    if args.ocr: headers += ['ocr_accuracy_mean']
+
+    box_headers = ['name', 'box_index', 'x1', 'y1', 'x2', 'y2', 'text']
+    if args.psnr: box_headers += ['psnr']
+    if args.ssim: box_headers += ['ssim']
+    if args.lpips: box_headers += ['lpips']
+    if args.ocr: box_headers += ['ocr_accuracy']
+    return headers, box_headers
+
+def box_csv_path(args):
+    return args.box_csv or os.path.splitext(args.output_csv)[0] + "_boxes.csv"
+
+def check_resume(args):
+    """Error message if --resume would append rows under a different column layout, else None."""
+    headers, box_headers = result_headers(args)
+    header, done = read_done_names(args.output_csv)
+    if not done:
+        return None
+    if header != headers:
+        return (f"--resume: {args.output_csv} has columns {header}, but the selected metrics give {headers}; "
+                "use the same metric flags or a new --output_csv")
+    box_header = read_header(box_csv_path(args))
+    if box_header != box_headers:
+        return (f"--resume: {box_csv_path(args)} has columns {box_header}, expected {box_headers}; "
+                "use the same metric flags or a new --box_csv")
+    return None
+
+def truncate_box_rows(box_csv, keep_names):
+    """Drop per-box rows of images whose per-image row was never written."""
+    if not os.path.exists(box_csv):
+        return
+    with open(box_csv, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        rows = [r for r in reader if r and r[0] in keep_names]
+    if header is None:
+        return
+    with open(box_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def box_csv_to_npz(box_csv, npz_path):
+    """Convert the streamed per-box CSV into one column per array in an NPZ."""
+    with open(box_csv, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = {name: [] for name in reader.fieldnames}
+        for row in reader:
+            for k, v in row.items():
+                columns[k].append(v)
+
+    arrays = {}
+    for k, values in columns.items():
+        if k in ('name', 'text'):
+            arrays[k] = np.array(values, dtype=str)
+        elif k in ('box_index', 'x1', 'y1', 'x2', 'y2'):
+            arrays[k] = np.array(values, dtype=np.int32)
+        else:
+            arrays[k] = np.array([float(v) if v != '' else np.nan for v in values], dtype=np.float32)
+    np.savez(npz_path, **arrays)
+
 def main(args):
     lpips_model = get_lpips_model(args.lpips_model) if args.lpips else None
-    ocr_reader = easyocr.Reader(['en', 'latin']) if args.ocr else None
+    ocr_reader = None
+    if args.ocr:
+        import easyocr
+        ocr_reader = easyocr.Reader(['en', 'latin'])
+
+    if args.shards:
+        from shards import ShardReader
+        pairs, missing = build_shard_pairs(ShardReader(args.shards), args.pred_dir, args.pred_field, args.manifest)
+    else:
+        pairs, missing = build_pairs(args.gt_dir, args.pred_dir, args.box_dir, args.manifest)
+    for name, reason in missing:
+        print(f"[!] {name}: missing {reason} file, skipped")
 
-    image_pairs = sorted(zip(
-        sorted(glob(os.path.join(args.gt_dir, "*.png"))),
-        sorted(glob(os.path.join(args.pred_dir, "*.png")))
-    ))
+    box_csv = box_csv_path(args)
+    if args.resume:
+        for path in (args.output_csv, box_csv):
+            dropped = drop_partial_rows(path)
+            if dropped:
+                print(f"[!] {path}: dropped {dropped} incomplete row(s) from the interrupted run")
+    done = read_done_names(args.output_csv)[1] if args.resume else set()
+    if done:
+        truncate_box_rows(box_csv, done)
+        print(f"[-] Resuming: {len(done)} image(s) already evaluated")
+    todo = [p for p in pairs if p[0] not in done]
+    headers, box_headers = result_headers(args)
 
-    with open(args.output_csv, 'w', newline='') as csvfile:
+    tracer = get_tracer("evaluate")
+    mode = 'a' if done else 'w'
+    with open(args.output_csv, mode, newline='', encoding='utf-8') as csvfile, \
+         open(box_csv, mode, newline='', encoding='utf-8') as boxfile:
         writer = csv.writer(csvfile)
-        headers = ['index']
-        if args.psnr: headers += ['global_psnr']
-        if args.ssim: headers += ['global_ssim']
-        if args.lpips: headers += ['global_lpips']
-        if args.psnr: headers += ['box_psnr_list']
-        if args.ssim: headers += ['box_ssim_list']
-        if args.lpips: headers += ['box_lpips_list']
-        if args.ocr: headers += ['ocr_accuracy_list']
-        writer.writerow(headers)
-
-        for idx, (gt_path, pred_path) in enumerate(tqdm(image_pairs)):
-            gt_img = load_image(gt_path)
-            pred_img = load_image(pred_path).astype(np.uint8)
-            pred_img = np.array(Image.fromarray(pred_img).resize(gt_img.shape[1::-1], Image.BICUBIC))
-            base_name = os.path.splitext(os.path.basename(gt_path))[0]
-            box_file = os.path.join(args.box_dir, base_name + ".json")
-
-            row = [idx]
-            global_metrics = compute_global_metrics(gt_img, pred_img, lpips_model, args.psnr, args.ssim, args.lpips)
-            if args.psnr: row.append(global_metrics.get("psnr", ""))
-            if args.ssim: row.append(global_metrics.get("ssim", ""))
-            if args.lpips: row.append(global_metrics.get("lpips", ""))
-
-            boxes, texts = parse_boxes_json(box_file)
-            box_psnr, box_ssim, box_lpips = compute_box_metrics(gt_img, pred_img, boxes, lpips_model, args.psnr, args.ssim, args.lpips)
-            if args.psnr: row.append(box_psnr)
-            if args.ssim: row.append(box_ssim)
-            if args.lpips: row.append(box_lpips)
-
-            if args.ocr:
-                ocr_acc = compute_ocr_accuracy(pred_img, boxes, texts, ocr_reader)
-                row.append(ocr_acc)
+        box_writer = csv.writer(boxfile)
+        if not done:
+            writer.writerow(headers)
+            box_writer.writerow(box_headers)
 
+        for name, gt_path, pred_path, box_file in tqdm(todo):
+            gt_img = load_image(resolve_source(gt_path))
+            pred_img = load_image(resolve_source(pred_path)).astype(np.uint8)
+            if pred_img.shape != gt_img.shape:
+                if not args.resize_pred:
+                    with tracer.item(name) as ev:
+                        ev.fail("SizeMismatch", f"{pred_img.shape[1::-1]} != {gt_img.shape[1::-1]}")
+                    print(f"[!] {name}: prediction is {pred_img.shape[1]}x{pred_img.shape[0]}, "
+                          f"GT is {gt_img.shape[1]}x{gt_img.shape[0]}, skipped (use --resize_pred)")
+                    continue
+                pred_img = np.array(Image.fromarray(pred_img).resize(gt_img.shape[1::-1], Image.BICUBIC))
+
+            row = [name]
+            # Metric computation is one traced item; decode and CSV writes are not included
+            with tracer.item(name, inputs=[p for p in (gt_path, pred_path) if not callable(p)]) as ev:
+                global_metrics = compute_global_metrics(gt_img, pred_img, lpips_model, args.psnr, args.ssim, args.lpips)
+                if args.psnr: row.append(global_metrics.get("psnr", ""))
+                if args.ssim: row.append(global_metrics.get("ssim", ""))
+                if args.lpips: row.append(global_metrics.get("lpips", ""))
+
+                boxes, texts = parse_boxes_json(resolve_source(box_file))
+                # Keep boxes aligned with their metrics: compute_box_metrics skips empty crops
+                kept = [(b, t) for b, t in zip(boxes, texts)
+                        if gt_img[b[1]:b[3], b[0]:b[2]].size > 0]
+                boxes = [b for b, _ in kept]
+                texts = [t for _, t in kept]
+                box_psnr, box_ssim, box_lpips = compute_box_metrics(gt_img, pred_img, boxes, lpips_model, args.psnr, args.ssim, args.lpips)
+                ocr_acc = compute_ocr_accuracy(gt_img, pred_img, boxes, ocr_reader) if args.ocr else []
+                ev.extra["num_boxes"] = len(boxes)
+
+            row.append(len(boxes))
+            for enabled, values in ((args.psnr, box_psnr), (args.ssim, box_ssim),
+                                    (args.lpips, box_lpips), (args.ocr, ocr_acc)):
+                if enabled:
+                    row.append(float(np.mean(values)) if values else "")
+
+            for i, (box, text) in enumerate(zip(boxes, texts)):
+                box_row = [name, i, *box, text]
+                for enabled, values in ((args.psnr, box_psnr), (args.ssim, box_ssim),
+                                        (args.lpips, box_lpips), (args.ocr, ocr_acc)):
+                    if enabled:
+                        box_row.append(values[i] if i < len(values) else "")
+                box_writer.writerow(box_row)
+
+            # Box rows first, image row last: the image row marks the item done
+            boxfile.flush()
             writer.writerow(row)
+            csvfile.flush()
+
+    if args.output_npz:
+        box_csv_to_npz(box_csv, args.output_npz)
+        print(f"[OK] Wrote per-box columns to {args.output_npz}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--gt_dir', required=True, help='Ground truth image directory')
-    parser.add_argument('--pred_dir', required=True, help='Upscaled image directory')
-    parser.add_argument('--box_dir', required=True, help='Bounding box JSON file directory')
-    parser.add_argument('--output_csv', default='evaluation_results.csv', help='Output CSV path')
+    parser.add_argument('--gt_dir', help='Ground truth image directory')
+    parser.add_argument('--pred_dir', help='Upscaled image directory')
+    parser.add_argument('--box_dir', help='Bounding box JSON file directory')
+    parser.add_argument('--shards', default=None, help='Shard index.json (from shards.py) to read GT images and boxes from')
+    parser.add_argument('--pred_field', default=None, help='With --shards, read predictions from this shard field (e.g. degraded.png)')
+    parser.add_argument('--manifest', default=None, help='CSV with a `name` column (optional gt/pred/box paths) to evaluate')
+    parser.add_argument('--output_csv', default='evaluation_results.csv', help='Per-image output CSV path')
+    parser.add_argument('--box_csv', default=None, help='Per-box output CSV path (default: <output_csv>_boxes.csv)')
+    parser.add_argument('--output_npz', default=None, help='Also write per-box results as columnar NPZ')
+    parser.add_argument('--resize_pred', action='store_true', help='Bicubic-resize predictions whose size differs from GT instead of skipping them')
+    parser.add_argument('--resume', action='store_true', help='Skip images already present in --output_csv')
     parser.add_argument('--psnr', action='store_true', help='Include PSNR')
     parser.add_argument('--ssim', action='store_true', help='Include SSIM')
     parser.add_argument('--lpips', action='store_true', help='Include LPIPS')
     parser.add_argument('--lpips_model', default='alex', choices=['alex', 'vgg', 'squeeze'], help='Backbone for LPIPS')
     parser.add_argument('--ocr', action='store_true', help='Include OCR accuracy')
     args = parser.parse_args()
+    if args.shards:
+        if not (args.pred_dir or args.pred_field):
+            parser.error('--shards needs --pred_dir or --pred_field')
+    elif not (args.gt_dir and args.pred_dir and args.box_dir):
+        parser.error('--gt_dir, --pred_dir and --box_dir are required without --shards')
+    if args.resume:
+        error = check_resume(args)
+        if error:
+            parser.error(error)
     main(args)
@@ -0,0 +1,617 @@
+# pip install pillow numpy tqdm
+import argparse
+import json
+import math
+import random
+import re
+import tempfile
+from pathlib import Path
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from tqdm import tqdm
+from tracing import get_tracer
+
+DIAGRAM_DIR = Path("diagrams")
+OUT_DIR = Path("images")
+RENDERED_DIR = Path("rendered")
+DPI = 300
+STRIP_BYTES = 64 << 20               # supersampled canvas budget per band in rasterize()
+
+class Unsupported(Exception):
+    """The diagram uses TikZ outside the fast-path subset; render it with LaTeX instead."""
+
+# ---------------------------------------------------------------- metrics
+# Computer Modern Roman 10pt: (advance width, height, depth) in TeX pt, from cmr10.tfm.
+# Kerning and ligatures are ignored, which is within a pixel for short node labels.
+
+_GLYPHS = {}
+for _c, _w in zip("abcdefghijklmnopqrstuvwxyz",
+                  [5.0, 5.556, 4.444, 5.556, 4.444, 3.056, 5.0, 5.556, 2.778, 3.056, 5.278, 2.778, 8.333,
+                   5.556, 5.0, 5.556, 5.278, 3.917, 3.944, 3.889, 5.556, 5.278, 7.222, 5.278, 5.278, 4.444]):
+    _h = 6.944 if _c in "bdfhkl" else 6.679 if _c in "ij" else 6.151 if _c == "t" else 4.306
+    _GLYPHS[_c] = (_w, _h, 1.944 if _c in "gjpqy" else 0.0)
+for _c, _w in zip("ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+                  [7.5, 7.083, 7.222, 7.639, 6.806, 6.528, 7.847, 7.5, 3.611, 5.139, 7.778, 6.25, 9.167,
+                   7.5, 7.778, 6.806, 7.778, 7.361, 5.556, 7.222, 7.5, 7.5, 10.278, 7.5, 7.5, 6.111]):
+    _GLYPHS[_c] = (_w, 6.833, 1.944 if _c == "Q" else 0.0)
+for _c in "0123456789":
+    _GLYPHS[_c] = (5.0, 6.444, 0.0)
+_GLYPHS.update({
+    " ": (3.333, 0.0, 0.0), ".": (2.778, 1.056, 0.0), ",": (2.778, 1.056, 1.944),
+    ":": (2.778, 4.306, 0.0), ";": (2.778, 4.306, 1.944), "!": (2.778, 6.944, 0.0),
+    "?": (4.722, 6.944, 0.0), "(": (3.889, 7.5, 2.5), ")": (3.889, 7.5, 2.5),
+    "+": (7.778, 5.833, 0.833), "=": (7.778, 3.667, 0.0), "-": (3.333, 4.306, 0.0),
+    "/": (5.0, 7.5, 2.5), "'": (2.778, 6.944, 0.0),
+})
+
+# PDF font descriptor of CMR10; PyMuPDF word boxes span baseline - ascent .. baseline + descent
+ASCENT, DESCENT = 6.94, 1.94
+EM = 10.0
+PT_PER_CM = 72.27 / 2.54
+BP = 72.27 / 72                      # one PostScript point in TeX pt
+BORDER = 0.5 * BP                    # standalone's default border
+INNER_SEP = 0.3333 * EM
+LINE_WIDTHS = {"ultra thin": 0.1, "very thin": 0.2, "thin": 0.4, "semithick": 0.6,
+               "thick": 0.8, "very thick": 1.2, "ultra thick": 1.6}
+COLORS = {"black": (0, 0, 0), "white": (255, 255, 255), "red": (255, 0, 0), "green": (0, 255, 0),
+          "blue": (0, 0, 255), "gray": (128, 128, 128), "yellow": (255, 255, 0), "cyan": (0, 255, 255),
+          "magenta": (255, 0, 255), "orange": (255, 128, 0), "lightgray": (191, 191, 191),
+          "darkgray": (64, 64, 64)}
+PLAIN_TEXT = re.compile(r"^[A-Za-z0-9 .,:;!?()+=\-/']*$")
+
+def text_metrics(text):
+    """(width, height, depth) in pt of a plain-text label set in cmr10."""
+    if not PLAIN_TEXT.match(text):
+        raise Unsupported(f"label is not plain text: {text!r}")
+    width = sum(_GLYPHS[c][0] for c in text)
+    height = max((_GLYPHS[c][1] for c in text), default=0.0)
+    depth = max((_GLYPHS[c][2] for c in text), default=0.0)
+    return width, height, depth
+
+# ---------------------------------------------------------------- parsing
+
+def parse_color(spec):
+    """`red`, `black!50` (mixed with white) or `red!30!blue`."""
+    def named(name):
+        if name not in COLORS:
+            raise Unsupported(f"color {spec!r}")
+        return np.array(COLORS[name], dtype=float)
+
+    parts = spec.strip().split("!")
+    rgb, rest = named(parts[0]), parts[1:]
+    while rest:
+        try:
+            pct = float(rest[0]) / 100
+        except ValueError:
+            raise Unsupported(f"color {spec!r}")
+        other = named(rest[1]) if len(rest) > 1 else named("white")
+        rgb = rgb * pct + other * (1 - pct)
+        rest = rest[2:]
+    return tuple(int(round(v)) for v in rgb)
+
+def parse_number(spec, what="number"):
+    try:
+        return float(spec)
+    except ValueError:
+        raise Unsupported(f"{what} {spec!r}")
+
+def parse_length(spec, default_unit="cm"):
+    m = re.fullmatch(r"\s*(-?[\d.]+)\s*(cm|mm|pt|bp|in|em|ex)?\s*", spec)
+    if not m:
+        raise Unsupported(f"length {spec!r}")
+    value = parse_number(m.group(1), "length")
+    unit = m.group(2) or default_unit
+    return value * {"cm": PT_PER_CM, "mm": PT_PER_CM / 10, "pt": 1.0, "bp": BP, "in": 72.27,
+                    "em": EM, "ex": 4.306}[unit]
+
+def split_options(opts):
+    return [o.strip() for o in opts.split(",") if o.strip()] if opts else []
+
+def parse_style(opts, node=False):
+    """Known drawing options -> dict; anything else sends the diagram to LaTeX."""
+    # "draw" stays True until the end so `[draw, red]` and `[red, draw]` agree, as in TikZ
+    style = {"line_width": 0.4, "draw": None if node else True, "fill": None, "color": (0, 0, 0),
+             "text": None, "shape": "rectangle", "minimum": 0.0, "inner_sep": INNER_SEP}
+    for opt in split_options(opts):
+        key, _, value = opt.partition("=")
+        key, value = key.strip(), value.strip()
+        if opt in LINE_WIDTHS:
+            style["line_width"] = LINE_WIDTHS[opt]
+        elif key == "line width":
+            style["line_width"] = parse_length(value, "pt")
+        elif node and opt in ("circle", "rectangle"):
+            style["shape"] = opt
+        elif opt == "draw" and node:
+            style["draw"] = True
+        elif key == "draw" and value:
+            style["draw"] = parse_color(value)
+        elif key == "fill" and value:
+            style["fill"] = parse_color(value)
+        elif key == "text" and value and node:
+            style["text"] = parse_color(value)
+        elif key == "color" and value:
+            style["color"] = parse_color(value)
+        elif node and key == "minimum size":
+            style["minimum"] = parse_length(value)
+        elif node and key == "inner sep":
+            style["inner_sep"] = parse_length(value, "pt")
+        elif not value and opt.split("!")[0] in COLORS:
+            style["color"] = parse_color(opt)
+        else:
+            raise Unsupported(f"option {opt!r}")
+    if style["draw"] is True:
+        style["draw"] = style["color"]
+    if style["text"] is None:
+        style["text"] = style["color"]
+    return style
+
+def strip_comments(tex):
+    return re.sub(r"(?<!\\)%.*", "", tex)
+
+def split_statements(body):
+    """Split on ';' at brace depth 0 so labels may contain semicolons."""
+    statements, depth, current = [], 0, []
+    for ch in body:
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        if ch == ";" and depth == 0:
+            statements.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if "".join(current).strip():
+        raise Unsupported("statement without terminating ';'")
+    return [s for s in statements if s]
+
+NODE_RE = re.compile(r"\\node\s*(?:\[(?P<opts>[^\]]*)\])?\s*(?:\((?P<name>[\w\-]+)\))?\s*"
+                     r"(?:at\s*\((?P<at>[^()]*)\))?\s*\{(?P<text>[^{}]*)\}", re.S)
+DRAW_RE = re.compile(r"\\draw\s*(?:\[(?P<opts>[^\]]*)\])?\s*(?P<path>.*)", re.S)
+PATH_TOKEN_RE = re.compile(r"\s*(\([^()]*\)|--|cycle|circle|\[[^\]]*\])\s*")
+
+def extract_picture(tex):
+    """Body and options of the single tikzpicture in an identify.py diagram file."""
+    tex = strip_comments(tex)
+    m = re.search(r"\\begin\{document\}(.*)\\end\{document\}", tex, re.S)
+    doc = m.group(1) if m else tex
+    m = re.fullmatch(r"\s*\\begin\{tikzpicture\}\s*(?:\[(?P<opts>[^\]]*)\])?(?P<body>.*?)\\end\{tikzpicture\}\s*", doc, re.S)
+    if not m:
+        raise Unsupported("document is not a single tikzpicture")
+    preamble = tex[:tex.find("\\begin{document}")] if "\\begin{document}" in tex else ""
+    for line in preamble.splitlines():
+        line = line.strip()
+        if line and line not in ("\\documentclass{standalone}", "\\usepackage{tikz}", "\\usepackage{xcolor}"):
+            raise Unsupported(f"preamble line {line!r}")
+    return m.group("opts"), m.group("body")
+
+def parse_tikz(tex):
+    """Parse the fast-path subset into {'scale', 'nodes', 'paths', 'items'} or raise Unsupported.
+
+    `items` holds ('node', node) and ('path', path) in source order, the order TikZ paints them.
+    """
+    opts, body = extract_picture(tex)
+    scale = 1.0
+    for opt in split_options(opts):
+        key, _, value = opt.partition("=")
+        if key.strip() != "scale":
+            raise Unsupported(f"picture option {opt!r}")
+        scale = parse_number(value, "scale")
+
+    nodes, paths = {}, []
+    order, items = [], []
+    for stmt in split_statements(body):
+        m = NODE_RE.fullmatch(stmt)
+        if m:
+            name = m.group("name") or f"__anon{len(order)}"
+            if name in nodes:
+                raise Unsupported(f"duplicate node name {name!r}")
+            at = _center(parse_coord(m.group("at"), nodes, scale)) if m.group("at") else (0.0, 0.0)
+            # TeX collapses runs of spaces
+            text = " ".join(m.group("text").split())
+            text_metrics(text)
+            nodes[name] = {"name": name, "at": at, "text": text, "style": parse_style(m.group("opts"), node=True)}
+            order.append(name)
+            items.append(("node", nodes[name]))
+            continue
+        m = DRAW_RE.fullmatch(stmt)
+        if m:
+            paths.append(parse_path(m.group("path"), parse_style(m.group("opts")), nodes, scale))
+            items.append(("path", paths[-1]))
+            continue
+        raise Unsupported(f"statement {stmt[:40]!r}")
+    return {"scale": scale, "nodes": [nodes[n] for n in order], "paths": paths, "items": items}
+
+def parse_coord(spec, nodes, scale):
+    spec = spec.strip()
+    if spec in nodes:
+        return nodes[spec]
+    if ":" in spec:
+        angle, radius = spec.split(":", 1)
+        r = parse_length(radius) * scale
+        a = math.radians(parse_number(angle, "angle"))
+        return (r * math.cos(a), r * math.sin(a))
+    parts = spec.split(",")
+    if len(parts) != 2:
+        raise Unsupported(f"coordinate {spec!r}")
+    return (parse_length(parts[0]) * scale, parse_length(parts[1]) * scale)
+
+def parse_path(path, style, nodes, scale):
+    """`(a) -- (b) -- (1,2) [-- cycle]` or `(c) circle (r)` / `circle [radius=r]`."""
+    tokens, pos = [], 0
+    while pos < len(path):
+        m = PATH_TOKEN_RE.match(path, pos)
+        if not m or m.end() == pos:
+            raise Unsupported(f"path {path[:40]!r}")
+        tokens.append(m.group(1))
+        pos = m.end()
+
+    if len(tokens) == 3 and tokens[1] == "circle":
+        center = _center(parse_coord(tokens[0][1:-1], nodes, scale))
+        radius_spec = tokens[2]
+        if radius_spec.startswith("["):
+            key, _, value = radius_spec[1:-1].partition("=")
+            if key.strip() != "radius":
+                raise Unsupported(f"circle option {radius_spec!r}")
+            radius_spec = value
+        else:
+            radius_spec = radius_spec[1:-1]
+        return {"kind": "circle", "center": center, "radius": parse_length(radius_spec) * scale, "style": style}
+
+    points, closed = [], False
+    expect_point = True
+    for tok in tokens:
+        if expect_point:
+            if tok == "cycle" and points:
+                closed = True
+            elif tok.startswith("("):
+                points.append(parse_coord(tok[1:-1], nodes, scale))
+            else:
+                raise Unsupported(f"path token {tok!r}")
+            expect_point = False
+        elif tok == "--" and not closed:
+            expect_point = True
+        else:
+            raise Unsupported(f"path token {tok!r}")
+    if expect_point or len(points) < 2:
+        raise Unsupported("incomplete path")
+    return {"kind": "line", "points": points, "closed": closed, "style": style}
+
+# ---------------------------------------------------------------- layout
+
+def node_geometry(node):
+    """Text box and shape size in pt, following TikZ's rectangle/circle node rules."""
+    w, h, d = text_metrics(node["text"])
+    style = node["style"]
+    sep = style["inner_sep"]
+    if style["shape"] == "circle":
+        r = max(math.hypot(w / 2 + sep, (h + d) / 2 + sep), style["minimum"] / 2)
+        half = (r, r)
+    else:
+        half = (max(w / 2 + sep, style["minimum"] / 2), max((h + d) / 2 + sep, style["minimum"] / 2))
+    node["box"] = (w, h, d)
+    node["half"] = half
+    # Anchors sit on the border plus outer sep (half the line width)
+    node["outer"] = style["line_width"] / 2
+
+def border_point(node, toward):
+    """Where a line from the node centre toward `toward` leaves the node."""
+    cx, cy = node["at"]
+    dx, dy = toward[0] - cx, toward[1] - cy
+    dist = math.hypot(dx, dy)
+    if dist == 0:
+        return cx, cy
+    hx, hy = node["half"]
+    if node["style"]["shape"] == "circle":
+        t = (hx + node["outer"]) / dist
+    else:
+        tx = (hx + node["outer"]) / abs(dx) if dx else math.inf
+        ty = (hy + node["outer"]) / abs(dy) if dy else math.inf
+        t = min(tx, ty)
+    return cx + dx * min(t, 1.0), cy + dy * min(t, 1.0)
+
+def _center(p):
+    return p["at"] if isinstance(p, dict) else p
+
+def layout(picture):
+    """Resolve node sizes and edge endpoints; returns the picture bbox in pt (y up)."""
+    xs, ys = [], []
+    for node in picture["nodes"]:
+        node_geometry(node)
+        (cx, cy), (hx, hy), o = node["at"], node["half"], node["outer"]
+        xs += [cx - hx - o, cx + hx + o]
+        ys += [cy - hy - o, cy + hy + o]
+
+    for path in picture["paths"]:
+        if path["kind"] == "circle":
+            (cx, cy), r = path["center"], path["radius"]
+            xs += [cx - r, cx + r]
+            ys += [cy - r, cy + r]
+            continue
+        pts = path["points"] + ([path["points"][0]] if path["closed"] else [])
+        segments = []
+        for a, b in zip(pts, pts[1:]):
+            start = border_point(a, _center(b)) if isinstance(a, dict) else a
+            end = border_point(b, _center(a)) if isinstance(b, dict) else b
+            segments.append((start, end))
+            xs += [start[0], end[0]]
+            ys += [start[1], end[1]]
+        path["segments"] = segments
+
+    if not xs:
+        raise Unsupported("empty picture")
+    return min(xs) - BORDER, min(ys) - BORDER, max(xs) + BORDER, max(ys) + BORDER
+
+# ---------------------------------------------------------------- rasterizing
+
+def _load_font(font_path, size_px):
+    candidates = [font_path] if font_path else ["cmunrm.ttf", "lmroman10-regular.otf", "DejaVuSerif.ttf"]
+    for path in candidates:
+        try:
+            return ImageFont.truetype(path, size_px)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size_px)
+    except TypeError:  # Pillow < 10.1 has no scalable default font
+        return ImageFont.load_default()
+
+def _draw(draw, picture, font, ss, x0, y1, top, bottom):
+    """Paint paths, node shapes and glyphs onto the supersampled rows [top, bottom) of the page."""
+    def to_px(x, y):
+        # Whole supersampled pixels: Pillow's float rasterization is not shift-invariant,
+        # so snapping first makes every band agree with a single full-page render
+        return math.floor((x - x0) * ss + 0.5), math.floor((y1 - y) * ss + 0.5) - top
+
+    def stroke(style):
+        return max(1, round(style["line_width"] * ss))
+
+    # TikZ paints statements in source order, so a later \draw crosses an earlier filled node
+    for kind, obj in picture["items"]:
+        if kind == "path":
+            _draw_path(draw, obj, to_px, ss, stroke)
+            continue
+        node, style = obj, obj["style"]
+        (cx, cy), (hx, hy) = node["at"], node["half"]
+        left, y_top = to_px(cx - hx, cy + hy)
+        right, y_bottom = to_px(cx + hx, cy - hy)
+        # Skip nodes outside this band; one em of slack covers glyph overhang and stroke width
+        if y_bottom + EM * ss < 0 or y_top - EM * ss > bottom - top:
+            continue
+        if style["fill"] is not None or style["draw"] is not None:
+            shape = draw.ellipse if style["shape"] == "circle" else draw.rectangle
+            shape((left, y_top, right, y_bottom), fill=style["fill"], outline=style["draw"],
+                  width=stroke(style) if style["draw"] is not None else 0)
+
+        # Glyphs are placed one by one on cmr10 advances so boxes match the layout exactly
+        w, h, d = node["box"]
+        baseline = cy - (h - d) / 2
+        wx = cx - w / 2
+        for ch in node["text"]:
+            if ch != " ":
+                draw.text(to_px(wx, baseline), ch, fill=style["text"], font=font, anchor="ls")
+            wx += _GLYPHS[ch][0]
+
+def _draw_path(draw, path, to_px, ss, stroke):
+    style = path["style"]
+    if path["kind"] == "circle":
+        (cx, cy), r = to_px(*path["center"]), math.floor(path["radius"] * ss + 0.5)
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), fill=style["fill"],
+                     outline=style["draw"], width=stroke(style))
+        return
+    segments = path["segments"]
+    if style["fill"] is not None:
+        # Like TikZ, fill open paths as if closed
+        corners = [start for start, _ in segments] + ([] if path["closed"] else [segments[-1][1]])
+        draw.polygon([to_px(*p) for p in corners], fill=style["fill"])
+    for start, end in segments:
+        draw.line([to_px(*start), to_px(*end)], fill=style["draw"], width=stroke(style))
+
+def _words(picture, x0, y1):
+    """pdf2png-style word boxes: PDF points, origin top-left of the page."""
+    words = []
+    for block, node in enumerate(picture["nodes"]):
+        (cx, cy) = node["at"]
+        w, h, d = node["box"]
+        baseline = cy - (h - d) / 2
+        wx = cx - w / 2
+        for word_num, word in enumerate(node["text"].split(" ")):
+            start = wx
+            wx += sum(_GLYPHS[ch][0] for ch in word)
+            if word:
+                words.append({
+                    "text": word,
+                    "bbox": [(start - x0) / BP, (y1 - baseline - ASCENT) / BP,
+                             (wx - x0) / BP, (y1 - baseline + DESCENT) / BP],
+                    "block": block,
+                    "line": 0,
+                    "word_num": word_num,
+                })
+            wx += _GLYPHS[" "][0]
+    return words
+
+def rasterize(picture, dpi=DPI, supersample=4, font_path=None, strip_bytes=STRIP_BYTES):
+    """Draw a laid-out picture; returns (RGB image, pdf2png-style word list in PDF points)."""
+    x0, y0, x1, y1 = layout(picture)
+    # Page size in PDF points, rasterized like pdftoppm at `dpi`; ss is supersampled px per TeX pt
+    ss = dpi / 72.27 * supersample
+    width = max(1, round((x1 - x0) / BP * dpi / 72))
+    height = max(1, round((y1 - y0) / BP * dpi / 72))
+    img = Image.new("RGB", (width, height), "white")
+    font = _load_font(font_path, max(1, round(EM * ss)))
+
+    # Supersample one band of output rows at a time so a large diagram never needs
+    # the whole page at supersample² its final size
+    band = max(1, strip_bytes // (3 * width * supersample * supersample))
+    for top in range(0, height, band):
+        rows = min(band, height - top)
+        canvas = Image.new("RGB", (width * supersample, rows * supersample), "white")
+        _draw(ImageDraw.Draw(canvas), picture, font, ss, x0, y1,
+              top * supersample, (top + rows) * supersample)
+        if supersample > 1:
+            canvas = canvas.resize((width, rows), Image.BOX)
+        img.paste(canvas, (0, top))
+    return img, _words(picture, x0, y1)
+
+# ---------------------------------------------------------------- entry points
+
+def render_fast(tex_path, out_dir, dpi=DPI, font_path=None):
+    """TeX-free render of one diagram into <stem>.png / <stem>.json, or raise Unsupported."""
+    picture = parse_tikz(Path(tex_path).read_text(errors="ignore"))
+    img, words = rasterize(picture, dpi, font_path=font_path)
+    png_path = out_dir / f"{tex_path.stem}.png"
+    json_path = out_dir / f"{tex_path.stem}.json"
+    img.save(png_path)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(words, f, indent=2, ensure_ascii=False)
+    return [png_path, json_path]
+
+def render_latex(tex_path, out_dir, rendered_dir):
+    """The regular path: pdflatex (render.py) then rasterize + word boxes (pdf2png.py)."""
+    import render
+    import pdf2png
+
+    if not render.compile_tex(tex_path, rendered_dir, enable_svg=False, enable_png=False):
+        raise RuntimeError(f"pdflatex failed for {tex_path.name}")
+    pdf_path = rendered_dir / tex_path.with_suffix(".pdf").name
+    lines = pdf2png.process_pdf(pdf_path, out_dir, tex_path.stem)
+    errors = [line.strip() for line in lines if "[x]" in line]
+    if errors:
+        raise RuntimeError(errors[0])
+    return sorted(out_dir.glob(f"{tex_path.stem}.*")) + sorted(out_dir.glob(f"{tex_path.stem}_page*.*"))
+
+def render_with_fallback(tex_path, out_dir, rendered_dir, dpi=DPI, font_path=None):
+    """Returns ('fast' | 'latex', outputs)."""
+    try:
+        return "fast", render_fast(tex_path, out_dir, dpi, font_path)
+    except Unsupported as e:
+        print(f"[-] {tex_path.name}: {e}, falling back to LaTeX")
+    return "latex", render_latex(tex_path, out_dir, rendered_dir)
+
+def _ink(path):
+    return np.asarray(Image.open(path).convert("L")) < 128
+
+def _pad_to(a, shape):
+    out = np.zeros(shape, dtype=a.dtype)
+    out[:a.shape[0], :a.shape[1]] = a[:shape[0], :shape[1]]
+    return out
+
+def validate(tex_paths, sample, dpi=DPI, font_path=None, seed=0):
+    """Render a sample both ways and report pixel and word-box agreement."""
+    supported = []
+    for p in tex_paths:
+        try:
+            parse_tikz(p.read_text(errors="ignore"))
+            supported.append(p)
+        except Unsupported:
+            pass
+    print(f"[OK] {len(supported)}/{len(tex_paths)} diagrams are in the fast-path subset")
+    rng = random.Random(seed)
+    chosen = rng.sample(supported, min(sample, len(supported)))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fast_dir, latex_dir, pdf_dir = tmp / "fast", tmp / "latex", tmp / "pdf"
+        for d in (fast_dir, latex_dir, pdf_dir):
+            d.mkdir()
+        for tex_path in tqdm(chosen, desc="Validating"):
+            try:
+                render_fast(tex_path, fast_dir, dpi, font_path)
+                render_latex(tex_path, latex_dir, pdf_dir)
+            except Exception as e:
+                print(f"[!] {tex_path.name}: {e}")
+                continue
+            fast, latex = _ink(fast_dir / f"{tex_path.stem}.png"), _ink(latex_dir / f"{tex_path.stem}.png")
+            fast_shape, latex_shape = fast.shape, latex.shape
+            shape = (max(fast.shape[0], latex.shape[0]), max(fast.shape[1], latex.shape[1]))
+            fast, latex = _pad_to(fast, shape), _pad_to(latex, shape)
+            agreement = float((fast == latex).mean())
+            union = np.logical_or(fast, latex).sum()
+            ink_iou = float(np.logical_and(fast, latex).sum() / union) if union else 1.0
+
+            fast_words = json.loads((fast_dir / f"{tex_path.stem}.json").read_text(encoding="utf-8"))
+            latex_words = json.loads((latex_dir / f"{tex_path.stem}.json").read_text(encoding="utf-8"))
+            box_ious = []
+            for lw in latex_words:
+                best = 0.0
+                for fw in fast_words:
+                    if fw["text"] == lw["text"]:
+                        best = max(best, _box_iou(fw["bbox"], lw["bbox"]))
+                box_ious.append(best)
+            rows.append({
+                "name": tex_path.stem,
+                "size_fast": [fast_shape[1], fast_shape[0]],
+                "size_latex": [latex_shape[1], latex_shape[0]],
+                "pixel_agreement": agreement,
+                "ink_iou": ink_iou,
+                "word_box_iou": float(np.mean(box_ious)) if box_ious else None,
+                "words_fast": len(fast_words),
+                "words_latex": len(latex_words),
+            })
+
+    for r in rows:
+        print(f"  {r['name']:<40} pixels {r['pixel_agreement']:.4f}  ink IoU {r['ink_iou']:.3f}  "
+              f"word IoU {r['word_box_iou'] if r['word_box_iou'] is not None else float('nan'):.3f}  "
+              f"size {r['size_fast']} vs {r['size_latex']}")
+    if rows:
+        print(f"[OK] Mean over {len(rows)}: pixel agreement {np.mean([r['pixel_agreement'] for r in rows]):.4f}, "
+              f"ink IoU {np.mean([r['ink_iou'] for r in rows]):.3f}")
+    return rows
+
+def _box_iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render simple TikZ diagrams without LaTeX, falling back to pdflatex + pdf2png otherwise")
+    parser.add_argument("--input_dir", default=str(DIAGRAM_DIR), help="Diagram .tex files from identify.py")
+    parser.add_argument("--output_dir", default=str(OUT_DIR), help="Output folder for PNG and JSON (pdf2png layout)")
+    parser.add_argument("--rendered_dir", default=str(RENDERED_DIR), help="PDF folder for the LaTeX fallback")
+    parser.add_argument("--dpi", type=int, default=DPI)
+    parser.add_argument("--font", default=None, help="TTF/OTF used to draw glyphs (e.g. cmunrm.ttf); layout uses cmr10 metrics regardless")
+    parser.add_argument("--no_fallback", action="store_true", help="Skip unsupported diagrams instead of running LaTeX")
+    parser.add_argument("--validate", type=int, default=0, metavar="N",
+                        help="Instead of rendering, compare fast vs LaTeX renders on N sampled diagrams")
+    parser.add_argument("--report", default=None, help="With --validate, save per-diagram results as JSON")
+    args = parser.parse_args()
+
+    in_dir, out_dir, rendered_dir = Path(args.input_dir), Path(args.output_dir), Path(args.rendered_dir)
+    tex_paths = sorted(in_dir.glob("*.tex"))
+
+    if args.validate:
+        rows = validate(tex_paths, args.validate, args.dpi, args.font)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+        return
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rendered_dir.mkdir(parents=True, exist_ok=True)
+    tracer = get_tracer("fastrender")
+    counts = {"fast": 0, "latex": 0, "skipped": 0, "failed": 0}
+    for tex_path in tqdm(tex_paths, desc="Rendering"):
+        with tracer.item(tex_path.stem, inputs=[tex_path]) as ev:
+            try:
+                if args.no_fallback:
+                    mode, ev.outputs = "fast", render_fast(tex_path, out_dir, args.dpi, args.font)
+                else:
+                    mode, ev.outputs = render_with_fallback(tex_path, out_dir, rendered_dir, args.dpi, args.font)
+            except Unsupported as e:
+                mode = "skipped"
+                print(f"[-] {tex_path.name}: {e}")
+            except Exception as e:
+                mode = "failed"
+                ev.fail(type(e).__name__, str(e))
+                print(f"[!] {tex_path.name}: {e}")
+            ev.extra["path"] = mode
+        counts[mode] += 1
+    print(f"[OK] {counts['fast']} fast, {counts['latex']} via LaTeX, "
+          f"{counts['skipped']} skipped, {counts['failed']} failed")
+
+if __name__ == "__main__":
+    main()
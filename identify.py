@@ -1,14 +1,12 @@
 import tarfile
 import re
 from pathlib import Path
+from tracing import get_tracer
 
 SOURCE_DIR = Path("sources")
 EXTRACT_DIR = Path("extracted")
 DIAGRAM_DIR = Path("diagrams")
 
-EXTRACT_DIR.mkdir(exist_ok=True)
-DIAGRAM_DIR.mkdir(exist_ok=True)
-
 def find_main_tex(files):
     for f in files:
         try:
@@ -19,17 +17,19 @@ def find_main_tex(files):
             print(f"[!] Could not read {f}: {e}")
     return None
 
-def extract_figures(tex_path):
+def extract_figures(tex_path, diagram_dir=DIAGRAM_DIR):
+    """Write every tikzpicture in tex_path as a standalone diagram. Returns the written paths."""
+    written = []
     try:
         content = tex_path.read_text(errors="ignore")
     except Exception as e:
         print(f"[!] Failed to read {tex_path}: {e}")
-        return
+        return written
 
     tikz_blocks = re.findall(r"\\begin{tikzpicture}.*?\\end{tikzpicture}", content, re.DOTALL)
     if not tikz_blocks:
         print(f"[-] No TikZ blocks found in {tex_path}")
-        return
+        return written
 
     for i, block in enumerate(tikz_blocks):
         diagram_tex = (
@@ -38,19 +38,18 @@ def extract_figures(tex_path):
             "\\begin{document}\n" + block + "\n\\end{document}"
         )
         try:
-            out_path = DIAGRAM_DIR / f"diag_{tex_path.stem}_{i}.tex"
+            out_path = diagram_dir / f"diag_{tex_path.stem}_{i}.tex"
             with open(out_path, "w") as f:
                 f.write(diagram_tex)
+            written.append(out_path)
             print(f"[OK] Extracted TikZ block to {out_path}")
         except Exception as e:
             print(f"[!] Failed to write diagram {i} from {tex_path}: {e}")
+    return written
 
-for tar_path in SOURCE_DIR.glob("*.tar.gz"):
-    out_subdir = EXTRACT_DIR / tar_path.stem
-    if out_subdir.exists() and list(out_subdir.glob("*.tex")):
-        print(f"[-] Already extracted: {tar_path.name}")
-        continue
-
+def extract_source(tar_path, extract_dir=EXTRACT_DIR, diagram_dir=DIAGRAM_DIR):
+    """Unpack one arXiv source tarball and extract its diagrams. Returns the written paths."""
+    out_subdir = extract_dir / tar_path.stem
     try:
         out_subdir.mkdir(exist_ok=True)
         with tarfile.open(tar_path) as tar:
@@ -58,16 +57,31 @@ for tar_path in SOURCE_DIR.glob("*.tar.gz"):
         print(f"[OK] Extracted {tar_path.name}")
     except Exception as e:
         print(f"[!] Failed to extract {tar_path.name}: {e}")
-        continue
+        return []
 
     tex_files = list(out_subdir.rglob("*.tex"))
     if not tex_files:
         print(f"[-] No .tex files found in {tar_path.name}")
-        continue
+        return []
 
     main_tex = find_main_tex(tex_files)
     if main_tex:
         print(f"[OK] Found main TeX file: {main_tex}")
-        extract_figures(main_tex)
-    else:
-        print(f"[!] No main TeX file found in {tar_path.name}")
+        return extract_figures(main_tex, diagram_dir)
+    print(f"[!] No main TeX file found in {tar_path.name}")
+    return []
+
+if __name__ == "__main__":
+    EXTRACT_DIR.mkdir(exist_ok=True)
+    DIAGRAM_DIR.mkdir(exist_ok=True)
+    tracer = get_tracer("identify")
+
+    for tar_path in SOURCE_DIR.glob("*.tar.gz"):
+        out_subdir = EXTRACT_DIR / tar_path.stem
+        if out_subdir.exists() and list(out_subdir.glob("*.tex")):
+            print(f"[-] Already extracted: {tar_path.name}")
+            continue
+
+        with tracer.item(tar_path.name, inputs=[tar_path]) as ev:
+            ev.outputs = extract_source(tar_path)
+            ev.extra["diagrams"] = len(ev.outputs)
@@ -0,0 +1,489 @@
+# pip install pillow pdf2image pymupdf tqdm
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from PIL import Image
+
+import color
+import degrademaker
+import blurmaker
+import identify
+import pdf2png
+import render
+import split
+from tracing import get_tracer
+
+STATE_PATH = Path(".pipeline_state.json")
+ROOT = Path(__file__).resolve().parent
+
+# Default parameters per stage; override with --config file.json or --set stage.key=value.
+# Every value here is part of the stage's fingerprint.
+DEFAULT_PARAMS = {
+    "filter": {},
+    "crawl": {},
+    "identify": {"source_dir": "sources", "extract_dir": "extracted", "diagram_dir": "diagrams"},
+    "render": {"diagram_dir": "diagrams", "out_dir": "rendered", "enable_svg": False, "enable_png": False},
+    "mask": {"diagram_dir": "diagrams", "mask_dir": "masks", "render_dir": "mask_renders"},
+    "rasterize": {"pdf_dir": "rendered", "out_dir": "images", "skip_empty": False, "detect_blank": True},
+    "degrade": {"image_dir": "images", "original_dir": "original", "bbox_dir": "bboxes",
+                "out_dir": "degraded", "log_path": "degrade_log.csv", "seed": 0},
+    "blur": {"image_dir": "images", "original_dir": "originals", "bbox_dir": "bboxes",
+             "mask_render_dir": "mask_renders", "out_dir": "blurred", "log_path": "blur_log.csv", "seed": 0},
+    "split": {"input_dir": "blurred", "out_dir": "split"},
+    "evaluate": {"gt_dir": "original", "pred_dir": None, "box_dir": "bboxes",
+                 "output_csv": "evaluation_results.csv", "metrics": ["psnr", "ssim"]},
+}
+
+class Item:
+    """One unit of work: a diagram, PDF or image flowing through a stage."""
+
+    def __init__(self, item_id, inputs, run):
+        self.item_id = item_id
+        self.inputs = [Path(p) for p in inputs]
+        # run() returns (output paths, metadata dict) and raises on failure
+        self.run = run
+
+class Stage:
+    def __init__(self, name, deps, code, items, finalize=None):
+        self.name = name
+        self.deps = deps
+        self.code = code
+        # items(params) enumerates work once upstream stages have finished
+        self.items = items
+        # finalize(params, metas) runs after all items, e.g. to write a CSV log
+        self.finalize = finalize
+
+# ---------------------------------------------------------------- fingerprints
+
+class FileHasher:
+    """sha256 of file contents, cached on (size, mtime) across runs."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.lock = threading.Lock()
+
+    def digest(self, path):
+        path = Path(path)
+        if path.is_dir():
+            h = hashlib.sha256()
+            for child in sorted(p for p in path.rglob("*") if p.is_file()):
+                h.update(child.relative_to(path).as_posix().encode())
+                h.update(self.digest(child).encode())
+            return h.hexdigest()
+        if not path.exists():
+            return "missing"
+
+        st = path.stat()
+        key = path.as_posix()
+        with self.lock:
+            cached = self.cache.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self.lock:
+            self.cache[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+def fingerprint(hasher, stage, params, item):
+    h = hashlib.sha256()
+    h.update(stage.name.encode())
+    for code_file in stage.code:
+        h.update(hasher.digest(ROOT / code_file).encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    h.update(item.item_id.encode())
+    for p in sorted(item.inputs):
+        h.update(p.as_posix().encode())
+        h.update(hasher.digest(p).encode())
+    return h.hexdigest()
+
+def item_seed(seed, item_id):
+    """Stable per-item RNG seed so re-running one item reproduces its parameters."""
+    return int(hashlib.sha256(f"{seed}:{item_id}".encode()).hexdigest()[:16], 16)
+
+# ---------------------------------------------------------------- stages
+
+def _script_item(script, inputs, outputs, extra_args=()):
+    def run():
+        result = subprocess.run([sys.executable, str(ROOT / script), *extra_args])
+        if result.returncode != 0:
+            raise RuntimeError(f"{script} exited with {result.returncode}")
+        return outputs, {}
+    return Item(script, inputs, run)
+
+def filter_items(params):
+    return [_script_item("filter.py", [], ["filtered_papers.json"])]
+
+def crawl_items(params):
+    return [_script_item("crawl.py", ["filtered_papers.json"], ["sources"])]
+
+def identify_items(params):
+    extract_dir = Path(params["extract_dir"])
+    diagram_dir = Path(params["diagram_dir"])
+    extract_dir.mkdir(exist_ok=True)
+    diagram_dir.mkdir(exist_ok=True)
+
+    def make(tar_path):
+        def run():
+            return identify.extract_source(tar_path, extract_dir, diagram_dir), {}
+        return Item(tar_path.name, [tar_path], run)
+    return [make(p) for p in sorted(Path(params["source_dir"]).glob("*.tar.gz"))]
+
+def render_items(params):
+    out_dir = Path(params["out_dir"])
+    out_dir.mkdir(exist_ok=True)
+
+    def make(tex_file):
+        def run():
+            if not render.compile_tex(tex_file, out_dir, params["enable_svg"], params["enable_png"]):
+                raise RuntimeError(f"pdflatex failed for {tex_file.name}")
+            return [out_dir / tex_file.with_suffix(".pdf").name], {}
+        return Item(tex_file.stem, [tex_file], run)
+    return [make(p) for p in sorted(Path(params["diagram_dir"]).glob("*.tex"))]
+
+def mask_items(params):
+    mask_dir = Path(params["mask_dir"])
+    render_dir = Path(params["render_dir"])
+    mask_dir.mkdir(exist_ok=True)
+    render_dir.mkdir(exist_ok=True)
+
+    def make(tex_file):
+        def run():
+            if not color.make_mask(tex_file, mask_dir, render_dir):
+                raise RuntimeError(f"mask render failed for {tex_file.name}")
+            return [render_dir / tex_file.with_suffix(".png").name], {}
+        return Item(tex_file.stem, [tex_file], run)
+    return [make(p) for p in sorted(Path(params["diagram_dir"]).glob("*.tex"))]
+
+def rasterize_items(params):
+    out_dir = Path(params["out_dir"])
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    def make(pdf_path):
+        def run():
+            # Name outputs after the PDF (pdf2png --use_filename) so items stay stable
+            log_lines = pdf2png.process_pdf(pdf_path, out_dir, pdf_path.stem,
+                                            params["skip_empty"], params["detect_blank"])
+            errors = [line for line in log_lines if "[x]" in line]
+            if errors:
+                raise RuntimeError(errors[0].strip())
+            outputs = sorted(out_dir.glob(f"{pdf_path.stem}.*")) + sorted(out_dir.glob(f"{pdf_path.stem}_page*.*"))
+            return outputs, {}
+        return Item(pdf_path.stem, [pdf_path], run)
+    return [make(p) for p in sorted(Path(params["pdf_dir"]).glob("*.pdf"))]
+
+def _copy_atomic(src, dst):
+    # degrade and blur run concurrently and may share a destination (bboxes/ by default);
+    # replacing instead of rewriting in place means readers never see a truncated file
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.copy(src, tmp)
+    os.replace(tmp, dst)
+
+def _copy_pair(png_path, params):
+    """Copy the clean PNG and its bbox JSON next to the degraded set, like the maker scripts do."""
+    outputs = [Path(params["original_dir"]) / png_path.name]
+    _copy_atomic(png_path, outputs[0])
+    json_path = png_path.with_suffix(".json")
+    if json_path.exists():
+        outputs.append(Path(params["bbox_dir"]) / json_path.name)
+        _copy_atomic(json_path, outputs[-1])
+    return outputs
+
+def _image_inputs(png_path):
+    json_path = png_path.with_suffix(".json")
+    return [png_path, json_path] if json_path.exists() else [png_path]
+
+def degrade_items(params):
+    for key in ("original_dir", "bbox_dir", "out_dir"):
+        Path(params[key]).mkdir(parents=True, exist_ok=True)
+
+    def make(png_path):
+        def run():
+            rng = random.Random(item_seed(params["seed"], png_path.name))
+            rounds, quality = degrademaker.sample_degrade_params(rng)
+            outputs = _copy_pair(png_path, params)
+            out_path = Path(params["out_dir"]) / png_path.name
+            degrademaker.degrade_image(Image.open(png_path), rounds, quality).save(out_path, format="PNG")
+            return outputs + [out_path], {"filename": png_path.name, "rounds": rounds, "jpeg_quality": quality}
+        return Item(png_path.stem, _image_inputs(png_path), run)
+    return [make(p) for p in sorted(Path(params["image_dir"]).glob("*.png"))]
+
+def blur_items(params):
+    for key in ("original_dir", "bbox_dir", "out_dir"):
+        Path(params[key]).mkdir(parents=True, exist_ok=True)
+    mask_render_dir = Path(params["mask_render_dir"])
+
+    def make(png_path):
+        # The text mask from the mask stage is blurred with the same radius, giving the
+        # <name>_mask.png soft mask that split.py pairs with <name>.png
+        mask_render = mask_render_dir / png_path.name
+        inputs = _image_inputs(png_path) + ([mask_render] if mask_render.exists() else [])
+
+        def run():
+            rng = random.Random(item_seed(params["seed"], png_path.name))
+            radius = blurmaker.sample_blur_radius(rng)
+            outputs = _copy_pair(png_path, params)
+            out_path = Path(params["out_dir"]) / png_path.name
+            blurmaker.blur_image(Image.open(png_path), radius).save(out_path)
+            outputs.append(out_path)
+            if mask_render.exists():
+                mask_path = Path(params["out_dir"]) / f"{png_path.stem}_mask.png"
+                blurmaker.blur_image(color.text_mask(Image.open(mask_render)), radius).save(mask_path)
+                outputs.append(mask_path)
+            return outputs, {"filename": png_path.name, "blur_radius": radius}
+        return Item(png_path.stem, inputs, run)
+    return [make(p) for p in sorted(Path(params["image_dir"]).glob("*.png"))]
+
+def _write_log(fieldnames):
+    def finalize(params, metas):
+        rows = [m for _, m in sorted(metas.items()) if m]
+        with open(params["log_path"], "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"[OK] Wrote {len(rows)} rows to {params['log_path']}")
+    return finalize
+
+def split_items(params):
+    in_dir = Path(params["input_dir"])
+    out_dir = Path(params["out_dir"])
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    def make(m_path, img_path, base):
+        def run():
+            pos, neg = split.apply_soft_mask(Image.open(img_path), Image.open(m_path))
+            outputs = [out_dir / f"{base}_pos.png", out_dir / f"{base}_neg.png"]
+            pos.save(outputs[0])
+            neg.save(outputs[1])
+            return outputs, {}
+        return Item(base, [img_path, m_path], run)
+
+    items = []
+    for m_path in sorted(in_dir.glob("*_mask.png")):
+        base = m_path.stem.replace("_mask", "")
+        img_path = in_dir / f"{base}.png"
+        if img_path.exists():
+            items.append(make(m_path, img_path, base))
+    return items
+
+def evaluate_items(params):
+    if not params["pred_dir"]:
+        return []
+    args = ["--gt_dir", params["gt_dir"], "--pred_dir", params["pred_dir"],
+            "--box_dir", params["box_dir"], "--output_csv", params["output_csv"]]
+    args += [f"--{m}" for m in params["metrics"]]
+    inputs = [params["gt_dir"], params["pred_dir"], params["box_dir"]]
+    return [_script_item("evaluate.py", inputs, [params["output_csv"]], args)]
+
+STAGES = [
+    Stage("filter", [], ["filter.py"], filter_items),
+    Stage("crawl", ["filter"], ["crawl.py"], crawl_items),
+    Stage("identify", ["crawl"], ["identify.py"], identify_items),
+    Stage("render", ["identify"], ["render.py"], render_items),
+    Stage("mask", ["identify"], ["color.py"], mask_items),
+    # Stages whose per-item logic (naming, seeding, copies) lives here also hash pipeline.py
+    Stage("rasterize", ["render"], ["pdf2png.py", "pipeline.py"], rasterize_items),
+    Stage("degrade", ["rasterize"], ["degrademaker.py", "pipeline.py"], degrade_items,
+          _write_log(["filename", "rounds", "jpeg_quality"])),
+    Stage("blur", ["rasterize", "mask"], ["blurmaker.py", "color.py", "pipeline.py"], blur_items,
+          _write_log(["filename", "blur_radius"])),
+    Stage("split", ["blur"], ["split.py", "pipeline.py"], split_items),
+    Stage("evaluate", ["degrade"], ["evaluate.py"], evaluate_items),
+]
+
+# ---------------------------------------------------------------- runner
+
+def load_params(config_path, overrides):
+    params = json.loads(json.dumps(DEFAULT_PARAMS))
+    if config_path:
+        with open(config_path, encoding="utf-8") as f:
+            for stage, values in json.load(f).items():
+                params.setdefault(stage, {}).update(values)
+    for item in overrides:
+        key, value = item.split("=", 1)
+        stage, name = key.split(".", 1)
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+        params.setdefault(stage, {})[name] = value
+    return params
+
+def load_state(path):
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"files": {}, "stages": {}}
+
+def save_state(path, state, lock):
+    # Pool threads add to state["files"] while hashing, so serialize under their lock
+    with lock:
+        text = json.dumps(state)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def select_stages(targets, skip):
+    """The requested stages plus everything they depend on, minus skipped ones."""
+    by_name = {s.name: s for s in STAGES}
+    if not targets:
+        selected = set(by_name)
+    else:
+        selected = set()
+        todo = list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in selected:
+                selected.add(name)
+                todo += by_name[name].deps
+    return [s for s in STAGES if s.name in selected and s.name not in skip]
+
+def run_pipeline(stages, params, state, jobs, force=False, dry_run=False, state_path=STATE_PATH):
+    hasher = FileHasher(state["files"])
+    stage_names = {s.name for s in stages}
+    pending = list(stages)
+    done = set()
+    failed = set()
+    running = {}        # future -> (stage, item)
+    outstanding = {}    # stage name -> number of unfinished items
+    item_failures = {}  # stage name -> number of failed items
+    seen = {}           # stage name -> item ids enumerated in this run
+    last_save = time.monotonic()
+
+    def check(stage, item):
+        """Runs on the pool: fingerprint the item and decide whether it needs work."""
+        fp = fingerprint(hasher, stage, params.get(stage.name, {}), item)
+        record = state["stages"].get(stage.name, {}).get(item.item_id)
+        up_to_date = (
+            not force and record is not None and record["fingerprint"] == fp
+            and all(Path(p).exists() for p in record["outputs"])
+        )
+        if up_to_date or dry_run:
+            return fp, record if up_to_date else None, up_to_date
+        with get_tracer(stage.name).item(item.item_id, inputs=[p for p in item.inputs if p.is_file()]) as ev:
+            outputs, meta = item.run()
+            ev.outputs = [p for p in outputs if Path(p).is_file()]
+        return fp, {"fingerprint": fp, "outputs": [Path(p).as_posix() for p in outputs], "meta": meta}, False
+
+    def finish_stage(stage):
+        if not dry_run:
+            # Forget items that no longer exist upstream
+            records = state["stages"].setdefault(stage.name, {})
+            for item_id in set(records) - seen[stage.name]:
+                del records[item_id]
+            save_state(state_path, state, hasher.lock)
+            if stage.finalize:
+                try:
+                    stage.finalize(params.get(stage.name, {}), {k: r.get("meta") for k, r in records.items()})
+                except Exception as e:
+                    failed.add(stage.name)
+                    print(f"[!] Stage {stage.name} failed: {type(e).__name__}: {e}")
+                    return
+        done.add(stage.name)
+        if item_failures.get(stage.name):
+            # Failed items stay unrecorded and retry next run; downstream continues with the rest
+            print(f"[!] Stage {stage.name} finished with {item_failures[stage.name]} failed item(s)")
+        else:
+            print(f"[OK] Stage {stage.name} finished")
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            # Launch every stage whose upstream stages (within this run) have finished
+            for stage in list(pending):
+                deps = [d for d in stage.deps if d in stage_names]
+                if any(d in failed for d in deps):
+                    pending.remove(stage)
+                    failed.add(stage.name)
+                    print(f"[!] Stage {stage.name} skipped: upstream failed")
+                    continue
+                if not all(d in done for d in deps):
+                    continue
+                pending.remove(stage)
+                try:
+                    items = stage.items(params.get(stage.name, {}))
+                except Exception as e:
+                    failed.add(stage.name)
+                    print(f"[!] Stage {stage.name} failed: {type(e).__name__}: {e}")
+                    continue
+                seen[stage.name] = {item.item_id for item in items}
+                outstanding[stage.name] = len(items)
+                print(f"[+] Stage {stage.name}: {len(items)} item(s)")
+                for item in items:
+                    running[pool.submit(check, stage, item)] = (stage, item)
+                if not items:
+                    finish_stage(stage)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, item = running.pop(future)
+                try:
+                    fp, record, up_to_date = future.result()
+                except Exception as e:
+                    # Failed items are not recorded, so the next run retries them
+                    print(f"[!] {stage.name}/{item.item_id}: {type(e).__name__}: {e}")
+                    item_failures[stage.name] = item_failures.get(stage.name, 0) + 1
+                else:
+                    if record is not None and not dry_run:
+                        state["stages"].setdefault(stage.name, {})[item.item_id] = record
+                    if dry_run and not up_to_date:
+                        print(f"[~] {stage.name}/{item.item_id} would run")
+                outstanding[stage.name] -= 1
+                if outstanding[stage.name] == 0:
+                    finish_stage(stage)
+
+            # Checkpoint periodically so an interrupted run keeps finished items
+            if not dry_run and time.monotonic() - last_save > 30:
+                save_state(state_path, state, hasher.lock)
+                last_save = time.monotonic()
+
+    return sum(item_failures.values()), failed
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the dataset pipeline, re-running only invalidated items")
+    parser.add_argument("stages", nargs="*", help="Target stages (default: all); dependencies are included")
+    parser.add_argument("--skip", nargs="*", default=["filter", "crawl"],
+                        help="Stages to leave out (default: the network stages filter and crawl)")
+    parser.add_argument("--config", default=None, help="JSON file of {stage: {param: value}} overrides")
+    parser.add_argument("--set", dest="overrides", action="append", default=[],
+                        help="Override one parameter, e.g. --set degrade.seed=1")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Global CPU budget shared by all concurrently running stages")
+    parser.add_argument("--state", default=str(STATE_PATH), help="Fingerprint state file")
+    parser.add_argument("--force", action="store_true", help="Ignore fingerprints and re-run every item")
+    parser.add_argument("--dry_run", action="store_true", help="Only report which items would run")
+    args = parser.parse_args()
+
+    state_path = Path(args.state)
+    params = load_params(args.config, args.overrides)
+    stages = select_stages(args.stages, set(args.skip) - set(args.stages))
+    state = load_state(state_path)
+    n_failed, failed = run_pipeline(stages, params, state, args.jobs, args.force, args.dry_run, state_path)
+    if n_failed:
+        print(f"[-] {n_failed} item(s) failed and will be retried on the next run")
+    if failed:
+        print(f"[-] Failed or skipped stages: {', '.join(sorted(failed))}")
+    if n_failed or failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
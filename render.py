@@ -1,18 +1,16 @@
 import subprocess
 from pathlib import Path
+from tracing import get_tracer
 
 DIAGRAM_DIR = Path("diagrams")
 OUT_DIR = Path("rendered")
-OUT_DIR.mkdir(exist_ok=True)
 
 ENABLE_SVG = False
 ENABLE_PNG = True 
 
-for tex_file in DIAGRAM_DIR.glob("*.tex"):
-    pdf_name = OUT_DIR / tex_file.with_suffix(".pdf").name
-    if pdf_name.exists():
-        print(f"[-] Already compiled: {pdf_name.name}")
-        continue
+def compile_tex(tex_file, out_dir=OUT_DIR, enable_svg=ENABLE_SVG, enable_png=ENABLE_PNG):
+    """Compile one diagram .tex to PDF (plus optional SVG/PNG). Returns True on success."""
+    pdf_name = out_dir / tex_file.with_suffix(".pdf").name
 
     print(f"[OK] Compiling {tex_file.name}...")
 
@@ -21,7 +19,7 @@ for tex_file in DIAGRAM_DIR.glob("*.tex"):
             [
                 "pdflatex",
                 "-interaction=nonstopmode",
-                "-output-directory", OUT_DIR.as_posix(),
+                "-output-directory", out_dir.as_posix(),
                 tex_file.as_posix()
             ],
             stdout=subprocess.DEVNULL,
@@ -29,14 +27,14 @@ for tex_file in DIAGRAM_DIR.glob("*.tex"):
         )
         if result.returncode != 0:
             print(f"[!] Failed to compile {tex_file.name}")
-            continue
+            return False
     except Exception as e:
         print(f"[!] Exception compiling {tex_file.name}: {e}")
-        continue
+        return False
 
     print(f"[OK] PDF created: {pdf_name.name}")
 
-    if ENABLE_SVG:
+    if enable_svg:
         svg_name = pdf_name.with_suffix(".svg")
         try:
             subprocess.run(
@@ -48,7 +46,7 @@ for tex_file in DIAGRAM_DIR.glob("*.tex"):
         except Exception as e:
             print(f"[!] SVG conversion failed for {pdf_name.name}: {e}")
 
-    if ENABLE_PNG:
+    if enable_png:
         png_name = pdf_name.with_suffix(".png")
         try:
             subprocess.run(
@@ -64,3 +62,21 @@ for tex_file in DIAGRAM_DIR.glob("*.tex"):
             print(f"[OK] PNG created: {png_name.name}")
         except Exception as e:
             print(f"[!] PNG conversion failed for {pdf_name.name}: {e}")
+
+    return True
+
+if __name__ == "__main__":
+    OUT_DIR.mkdir(exist_ok=True)
+    tracer = get_tracer("render")
+
+    for tex_file in DIAGRAM_DIR.glob("*.tex"):
+        pdf_name = OUT_DIR / tex_file.with_suffix(".pdf").name
+        if pdf_name.exists():
+            print(f"[-] Already compiled: {pdf_name.name}")
+            continue
+
+        with tracer.item(tex_file.stem, inputs=[tex_file]) as ev:
+            if compile_tex(tex_file):
+                ev.outputs = [pdf_name]
+            else:
+                ev.fail("CompileError")
@@ -0,0 +1,195 @@
+# pip install pillow numpy tqdm
+import argparse
+import csv
+import io
+import json
+import os
+import tarfile
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+
+# Field name -> (source directory option, file name pattern relative to that directory)
+FIELDS = {
+    "clean.png":    ("clean_dir",    "{key}.png"),
+    "degraded.png": ("degraded_dir", "{key}.png"),
+    "blurred.png":  ("blurred_dir",  "{key}.png"),
+    "bbox.json":    ("bbox_dir",     "{key}.json"),
+    "mask.png":     ("mask_dir",     "{key}_mask.png"),
+}
+
+def load_log_params(log_paths):
+    """filename stem -> merged row of degrade_log.csv / blur_log.csv."""
+    params = {}
+    for log_path in log_paths:
+        if not Path(log_path).exists():
+            continue
+        with open(log_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                params.setdefault(Path(row.pop("filename")).stem, {}).update(row)
+    return params
+
+class ShardWriter:
+    """Append samples to uncompressed tar shards and record byte offsets per field.
+
+    Each sample becomes consecutive members `<key>.<field>`, so shards stay
+    readable with plain `tar` while the index allows seeking straight to a field.
+    """
+
+    def __init__(self, out_dir, prefix="shard", max_bytes=1 << 30):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.shards = []
+        self.samples = {}
+        self.tar = None
+
+    def _open_next(self):
+        if self.tar is not None:
+            self.tar.close()
+        name = f"{self.prefix}-{len(self.shards):05d}.tar"
+        self.shards.append(name)
+        self.tar = tarfile.open(self.out_dir / name, "w", format=tarfile.PAX_FORMAT)
+
+    def write(self, key, fields):
+        """fields: {field name: bytes}. A sample never straddles two shards."""
+        if self.tar is None or self.tar.offset >= self.max_bytes:
+            self._open_next()
+
+        entry = {"shard": len(self.shards) - 1, "fields": {}}
+        for field, data in fields.items():
+            info = tarfile.TarInfo(f"{key}.{field}")
+            info.size = len(data)
+            header_len = len(info.tobuf(self.tar.format, self.tar.encoding, self.tar.errors))
+            data_offset = self.tar.offset + header_len
+            self.tar.addfile(info, io.BytesIO(data))
+            entry["fields"][field] = [data_offset, len(data)]
+        self.samples[key] = entry
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.tar = None
+        index = {"shards": self.shards, "samples": self.samples}
+        with open(self.out_dir / "index.json", "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        return self.out_dir / "index.json"
+
+class ShardReader:
+    """Random and sequential access to packed samples without unpacking.
+
+    Works as a map-style dataset (`len`, integer or key indexing), so it can be
+    handed to a training DataLoader directly. Reads use positioned I/O
+    (os.pread), so forked workers that inherit the parent's descriptors do not
+    share a file offset; handles are dropped when the reader is pickled.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = Path(index_path)
+        with open(self.index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        self.shards = [self.index_path.parent / name for name in index["shards"]]
+        self.samples = index["samples"]
+        self.keys = list(self.samples)
+        self._handles = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_handles"] = {}
+        return state
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.samples
+
+    def fields(self, key):
+        return list(self.samples[key]["fields"])
+
+    def _handle(self, shard):
+        if shard not in self._handles:
+            self._handles[shard] = open(self.shards[shard], "rb")
+        return self._handles[shard]
+
+    def read(self, key, field):
+        """Raw bytes of one field of one sample."""
+        entry = self.samples[key]
+        offset, size = entry["fields"][field]
+        f = self._handle(entry["shard"])
+        if hasattr(os, "pread"):
+            return os.pread(f.fileno(), size, offset)
+        # Windows: no pread, but workers are spawned and get their own handles
+        f.seek(offset)
+        return f.read(size)
+
+    def open(self, key, field):
+        """File-like view of one field, for APIs that expect a path or stream."""
+        return io.BytesIO(self.read(key, field))
+
+    def load(self, key, fields=None):
+        """Decoded sample: PNGs as RGB (or L for masks) arrays, JSON parsed."""
+        sample = {"key": key}
+        for field in fields or self.fields(key):
+            data = self.read(key, field)
+            name, ext = field.rsplit(".", 1)
+            if ext == "png":
+                mode = "L" if name == "mask" else "RGB"
+                sample[name] = np.array(Image.open(io.BytesIO(data)).convert(mode))
+            elif ext == "json":
+                sample[name] = json.loads(data)
+            else:
+                sample[name] = data
+        return sample
+
+    def __getitem__(self, idx):
+        key = self.keys[idx] if isinstance(idx, int) else idx
+        return self.load(key)
+
+    def __iter__(self):
+        """Sequential pass in on-disk order, one shard at a time."""
+        order = sorted(self.keys, key=lambda k: (self.samples[k]["shard"],
+                                                 min(o for o, _ in self.samples[k]["fields"].values())))
+        for key in order:
+            yield self.load(key)
+
+    def close(self):
+        for f in self._handles.values():
+            f.close()
+        self._handles = {}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pack clean/degraded/blurred images, bboxes, masks and params into tar shards")
+    parser.add_argument("--clean_dir", default="./original", help="Clean PNGs (defines the sample keys)")
+    parser.add_argument("--degraded_dir", default="./degraded", help="JPEG/resize degraded PNGs")
+    parser.add_argument("--blurred_dir", default="./blurred", help="Blurred PNGs")
+    parser.add_argument("--bbox_dir", default="./bboxes", help="Word bbox JSONs")
+    parser.add_argument("--mask_dir", default="./blurred", help="Folder with <name>_mask.png text masks")
+    parser.add_argument("--logs", nargs="*", default=["degrade_log.csv", "blur_log.csv"],
+                        help="Degradation logs stored per sample as params.json")
+    parser.add_argument("--output_dir", default="./shards", help="Where to write shards and index.json")
+    parser.add_argument("--shard_size", type=int, default=1024, help="Target shard size in MB")
+    args = parser.parse_args()
+
+    params = load_log_params(args.logs)
+    writer = ShardWriter(args.output_dir, max_bytes=args.shard_size << 20)
+
+    keys = sorted(p.stem for p in Path(args.clean_dir).glob("*.png"))
+    for key in tqdm(keys, desc="Packing"):
+        fields = {}
+        for field, (dir_opt, pattern) in FIELDS.items():
+            path = Path(getattr(args, dir_opt)) / pattern.format(key=key)
+            if path.exists():
+                fields[field] = path.read_bytes()
+        if key in params:
+            fields["params.json"] = json.dumps(params[key]).encode("utf-8")
+        writer.write(key, fields)
+
+    index_path = writer.close()
+    print(f"[OK] Packed {len(keys)} samples into {len(writer.shards)} shard(s), index at {index_path}")
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from pathlib import Path
 import numpy as np
 from PIL import Image
 from tqdm import tqdm
+from tracing import get_tracer
 
 def apply_soft_mask(orig: Image.Image, mask: Image.Image):
     """Return (positive, negative) images as PIL.Image objects."""
@@ -36,6 +37,7 @@ def main():
 
     # Iterate over all masks first
     masks = sorted(in_dir.glob("*_mask.png"))
+    tracer = get_tracer("split")
     for m_path in tqdm(masks, desc="Splitting"):
         base    = m_path.stem.replace("_mask", "")
         img_path = in_dir / f"{base}.png"
@@ -44,12 +46,14 @@ def main():
             continue
 
         try:
-            orig = Image.open(img_path)
-            mask = Image.open(m_path)
-            pos, neg = apply_soft_mask(orig, mask)
-
-            pos.save(out_dir / f"{base}_pos.png")
-            neg.save(out_dir / f"{base}_neg.png")
+            with tracer.item(base, inputs=[img_path, m_path]) as ev:
+                orig = Image.open(img_path)
+                mask = Image.open(m_path)
+                pos, neg = apply_soft_mask(orig, mask)
+
+                pos.save(out_dir / f"{base}_pos.png")
+                neg.save(out_dir / f"{base}_neg.png")
+                ev.outputs = [out_dir / f"{base}_pos.png", out_dir / f"{base}_neg.png"]
         except Exception as e:
             print(f"[!] {base}: {e}")
 
@@ -0,0 +1,101 @@
+import argparse
+import csv
+import math
+from collections import defaultdict
+from pathlib import Path
+
+def load_params(log_paths):
+    """Map image stem -> {param: value} from degrade_log.csv / blur_log.csv."""
+    params = defaultdict(dict)
+    for log_path in log_paths:
+        with open(log_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                stem = Path(row.pop('filename')).stem
+                params[stem].update(row)
+    return params
+
+def summarize(results_csv, params, group_by, metrics=None):
+    """Stream a per-image (or per-box) result CSV and average metrics per group.
+
+    Only running sums are kept, so the result file is never loaded at once.
+    Returns {group_value: {metric: (mean, count)}}.
+    """
+    sums = defaultdict(lambda: defaultdict(float))
+    counts = defaultdict(lambda: defaultdict(int))
+
+    with open(results_csv, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        if metrics is None:
+            metrics = [c for c in reader.fieldnames
+                       if c not in ('name', 'box_index', 'x1', 'y1', 'x2', 'y2', 'text', 'num_boxes')]
+        for row in reader:
+            key = params.get(row['name'], {}).get(group_by)
+            if key is None:
+                continue
+            for m in metrics:
+                value = row.get(m, '')
+                if value == '':
+                    continue
+                value = float(value)
+                if math.isnan(value) or math.isinf(value):
+                    continue
+                sums[key][m] += value
+                counts[key][m] += 1
+
+    return {
+        key: {m: (sums[key][m] / counts[key][m], counts[key][m]) for m in counts[key]}
+        for key in counts
+    }
+
+def _sort_key(value):
+    try:
+        return (0, float(value))
+    except ValueError:
+        return (1, value)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize evaluate.py results per degradation parameter")
+    parser.add_argument("--results", default="evaluation_results.csv",
+                        help="Per-image or per-box CSV written by evaluate.py")
+    parser.add_argument("--logs", nargs="+", default=["degrade_log.csv"],
+                        help="Degradation logs to join on filename (degrade_log.csv, blur_log.csv)")
+    parser.add_argument("--group_by", default="jpeg_quality",
+                        help="Log column to group by (e.g. jpeg_quality, rounds, blur_radius)")
+    parser.add_argument("--metrics", nargs="*", default=None,
+                        help="Metric columns to average (default: all metric columns)")
+    parser.add_argument("--output_csv", default=None, help="Optional path to save the summary")
+    args = parser.parse_args()
+
+    params = load_params(args.logs)
+    summary = summarize(args.results, params, args.group_by, args.metrics)
+    if not summary:
+        print(f"[!] No rows in {args.results} matched a '{args.group_by}' entry in {', '.join(args.logs)}")
+        return
+
+    metrics = sorted({m for per_group in summary.values() for m in per_group})
+    rows = []
+    for key in sorted(summary, key=_sort_key):
+        row = [key]
+        for m in metrics:
+            mean, count = summary[key].get(m, (float('nan'), 0))
+            row += [f"{mean:.4f}", count]
+        rows.append(row)
+
+    headers = [args.group_by]
+    for m in metrics:
+        headers += [f"{m}_mean", f"{m}_count"]
+
+    print(",".join(headers))
+    for row in rows:
+        print(",".join(str(v) for v in row))
+
+    if args.output_csv:
+        with open(args.output_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+        print(f"[OK] Summary saved to {args.output_csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import argparse
+import atexit
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# TRACE_FILE: JSONL event log shared by every stage (empty string disables tracing)
+# TRACE_PROFILE: "cprofile" or "sample" to also profile items, written to TRACE_PROFILE_DIR
+TRACE_FILE = os.environ.get("TRACE_FILE", "trace.jsonl")
+TRACE_PROFILE = os.environ.get("TRACE_PROFILE", "")
+TRACE_PROFILE_DIR = Path(os.environ.get("TRACE_PROFILE_DIR", "profiles"))
+SAMPLE_INTERVAL = float(os.environ.get("TRACE_SAMPLE_INTERVAL", "0.005"))
+RSS_INTERVAL = float(os.environ.get("TRACE_RSS_INTERVAL", "0.01"))
+
+_write_lock = threading.Lock()
+_files = {}
+_tracers = {}
+# cProfile allows one active profiler per process (sys.monitoring on 3.12+), so all
+# stages share this lock and concurrent items are simply not profiled
+_profile_lock = threading.Lock()
+_run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+def _rss_bytes():
+    """Current resident set size; falls back to the process high-water mark off Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+def _mb(n):
+    return None if n is None else round(n / (1 << 20), 1)
+
+class _RssMonitor:
+    """Background thread that tracks the peak RSS seen while each item is open.
+
+    RSS is per process, so items running concurrently in threads (pipeline.py)
+    share their peaks.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.peaks = {}          # token -> peak bytes
+        self.thread = None
+
+    def start(self, token):
+        rss = _rss_bytes()
+        with self.lock:
+            self.peaks[token] = rss
+            if self.thread is None and rss is not None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        return rss
+
+    def stop(self, token):
+        rss = _rss_bytes()
+        with self.lock:
+            peak = self.peaks.pop(token, None)
+        if rss is None or peak is None:
+            return peak if rss is None else rss
+        return max(peak, rss)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            rss = _rss_bytes()
+            with self.lock:
+                for token, peak in self.peaks.items():
+                    if peak is not None and rss > peak:
+                        self.peaks[token] = rss
+
+_rss_monitor = _RssMonitor(RSS_INTERVAL)
+
+def _size(paths):
+    total = 0
+    for p in paths:
+        try:
+            total += os.path.getsize(p)
+        except OSError:
+            pass
+    return total
+
+def _emit(path, event):
+    line = json.dumps(event, default=str) + "\n"
+    with _write_lock:
+        f = _files.get(path)
+        if f is None:
+            f = _files[path] = open(path, "a", encoding="utf-8")
+        f.write(line)
+        f.flush()
+
+@atexit.register
+def _close_files():
+    for f in _files.values():
+        f.close()
+
+class Event:
+    """Mutable record for one item; fill in outputs or fail() inside the `with` block."""
+
+    def __init__(self, stage, item_id, inputs):
+        self.stage = stage
+        self.item_id = item_id
+        self.inputs = list(inputs)
+        self.outputs = []
+        self.outcome = "ok"
+        self.error = None
+        self.message = None
+        self.extra = {}
+
+    def fail(self, error, message=None):
+        """Mark a failure that the caller handled without raising (e.g. non-zero exit)."""
+        self.outcome = "error"
+        self.error = error
+        self.message = message
+
+class _Sampler:
+    """Background thread that samples every traced thread's stack into collapsed-stack counts."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.active = {}                        # thread id -> stage
+        self.counts = defaultdict(Counter)      # stage -> Counter(stack string)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.dump)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for tid, stage in list(self.active.items()):
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                stack = ";".join(f"{fs.name} ({Path(fs.filename).name}:{fs.lineno})"
+                                 for fs in traceback.extract_stack(frame))
+                self.counts[stage][stack] += 1
+
+    def dump(self):
+        TRACE_PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        for stage, counts in self.counts.items():
+            with open(TRACE_PROFILE_DIR / f"{stage}.stacks.txt", "w", encoding="utf-8") as f:
+                for stack, n in counts.most_common():
+                    f.write(f"{stack} {n}\n")
+
+_sampler = None
+
+class Tracer:
+    """Emits one JSONL event per work item of a stage."""
+
+    def __init__(self, stage, path=TRACE_FILE, profile=TRACE_PROFILE):
+        global _sampler
+        self.stage = stage
+        self.path = path
+        self.profile = profile
+        self.profiler = None
+        if profile == "cprofile":
+            self.profiler = cProfile.Profile()
+            atexit.register(self._dump_profile)
+        elif profile == "sample" and _sampler is None:
+            _sampler = _Sampler(SAMPLE_INTERVAL)
+
+    def _dump_profile(self):
+        TRACE_PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        self.profiler.dump_stats(TRACE_PROFILE_DIR / f"{self.stage}.prof")
+
+    @contextmanager
+    def item(self, item_id, inputs=()):
+        """Time one item. Exceptions are recorded with their class and re-raised."""
+        ev = Event(self.stage, item_id, inputs)
+        if not self.path:
+            yield ev
+            return
+
+        profiling = self.profiler is not None and _profile_lock.acquire(blocking=False)
+        tid = threading.get_ident()
+        if _sampler is not None:
+            _sampler.active[tid] = self.stage
+
+        if profiling:
+            try:
+                self.profiler.enable()
+            except ValueError:  # another profiler is already active (e.g. python -m cProfile)
+                _profile_lock.release()
+                profiling = False
+
+        token = object()
+        rss_start = _rss_monitor.start(token)
+        started = time.time()
+        t0 = time.perf_counter()
+        try:
+            yield ev
+        except BaseException as e:
+            ev.fail(type(e).__name__, str(e)[:500])
+            raise
+        finally:
+            duration = time.perf_counter() - t0
+            rss_peak = _rss_monitor.stop(token)
+            if profiling:
+                self.profiler.disable()
+                _profile_lock.release()
+            if _sampler is not None:
+                _sampler.active.pop(tid, None)
+            event = {
+                "run": _run_id,
+                "stage": self.stage,
+                "item": str(item_id),
+                "start": round(started, 3),
+                "duration": round(duration, 6),
+                "bytes_in": _size(ev.inputs),
+                "bytes_out": _size(ev.outputs),
+                # Process RSS at item start and its peak while the item ran
+                "rss_start_mb": _mb(rss_start),
+                "rss_peak_mb": _mb(rss_peak),
+                "outcome": ev.outcome,
+            }
+            if ev.error:
+                event["error"] = ev.error
+                event["message"] = ev.message
+            event.update(ev.extra)
+            _emit(self.path, event)
+
+def get_tracer(stage):
+    """Shared per-stage tracer configured from the TRACE_* environment variables."""
+    if stage not in _tracers:
+        _tracers[stage] = Tracer(stage)
+    return _tracers[stage]
+
+# ---------------------------------------------------------------- report
+
+def load_events(paths):
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # tolerate a torn last line from a killed run
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def report(paths, top=10, run=None):
+    durations = defaultdict(list)
+    bytes_in = Counter()
+    bytes_out = Counter()
+    span = {}
+    failures = defaultdict(Counter)
+    runs = set()
+    slowest = []
+
+    for ev in load_events(paths):
+        if run and ev.get("run") != run:
+            continue
+        stage = ev["stage"]
+        runs.add(ev.get("run"))
+        durations[stage].append(ev["duration"])
+        bytes_in[stage] += ev.get("bytes_in", 0)
+        bytes_out[stage] += ev.get("bytes_out", 0)
+        key = (stage, ev.get("run"))
+        lo, hi = span.get(key, (ev["start"], ev["start"] + ev["duration"]))
+        span[key] = (min(lo, ev["start"]), max(hi, ev["start"] + ev["duration"]))
+        if ev.get("outcome") != "ok":
+            failures[stage][ev.get("error") or "unknown"] += 1
+        slowest.append((ev["duration"], stage, ev["item"], ev.get("outcome")))
+
+    # Wall time per stage is summed over runs so gaps between runs do not count
+    wall_time = Counter()
+    for (stage, _), (lo, hi) in span.items():
+        wall_time[stage] += hi - lo
+
+    print(f"{len(runs)} run(s), {sum(len(v) for v in durations.values())} events\n")
+    print(f"{'stage':<12} {'items':>7} {'failed':>7} {'mean s':>8} {'p50 s':>8} {'p95 s':>8} "
+          f"{'max s':>8} {'items/s':>8} {'MB/s in':>8} {'MB/s out':>8}")
+    for stage in sorted(durations):
+        d = sorted(durations[stage])
+        wall = max(wall_time[stage], 1e-9)
+        print(f"{stage:<12} {len(d):>7} {sum(failures[stage].values()):>7} "
+              f"{sum(d) / len(d):>8.3f} {_percentile(d, 0.5):>8.3f} {_percentile(d, 0.95):>8.3f} {d[-1]:>8.3f} "
+              f"{len(d) / wall:>8.2f} {bytes_in[stage] / 1e6 / wall:>8.2f} {bytes_out[stage] / 1e6 / wall:>8.2f}")
+
+    if any(failures.values()):
+        print("\nFailures by class:")
+        for stage in sorted(failures):
+            for error, n in failures[stage].most_common():
+                print(f"  {stage:<12} {error:<28} {n}")
+
+    print(f"\nSlowest {top} items:")
+    for duration, stage, item, outcome in sorted(slowest, reverse=True)[:top]:
+        print(f"  {duration:>9.3f}s  {stage:<12} {item}  [{outcome}]")
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize JSONL trace events across runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rep = sub.add_parser("report", help="Slowest items, failure classes and throughput per stage")
+    rep.add_argument("paths", nargs="*", default=[TRACE_FILE or "trace.jsonl"], help="Trace JSONL files")
+    rep.add_argument("--top", type=int, default=10, help="How many slowest items to list")
+    rep.add_argument("--run", default=None, help="Only events from this run id")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        report(args.paths, args.top, args.run)
+
+if __name__ == "__main__":
+    main()
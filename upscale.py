@@ -0,0 +1,215 @@
+# pip install pillow numpy tqdm
+import argparse
+import importlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+import numpy as np
+from PIL import Image, ImageFilter
+from tqdm import tqdm
+from tracing import get_tracer
+
+# ---------------------------------------------------------------- upscalers
+# An upscaler takes a batch of tiles (N×T×T×3 uint8) and an integer scale and
+# returns N×(T·scale)×(T·scale)×3 uint8. Built-ins work tile by tile with PIL
+# and are split across threads; plugged-in upscalers get whole batches on one
+# thread unless the returned function sets `thread_safe = True`.
+
+def _resample(tile, scale, method):
+    img = Image.fromarray(tile)
+    return img.resize((img.width * scale, img.height * scale), method)
+
+def bicubic(tiles, scale):
+    return np.stack([np.asarray(_resample(t, scale, Image.BICUBIC)) for t in tiles])
+
+def lanczos(tiles, scale):
+    return np.stack([np.asarray(_resample(t, scale, Image.LANCZOS)) for t in tiles])
+
+def unsharp(tiles, scale):
+    return np.stack([
+        np.asarray(_resample(t, scale, Image.LANCZOS).filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3)))
+        for t in tiles
+    ])
+
+def text_aware(tiles, scale, lo=96, hi=200):
+    """Lanczos + unsharp, then snap near-white paper to white and stretch dark ink.
+
+    Rendered diagrams are dark strokes and glyphs on white, so pushing the two
+    ends of the tone curve apart removes most JPEG haze around text.
+    """
+    out = unsharp(tiles, scale).astype(np.float32)
+    luma = out.mean(axis=-1, keepdims=True)
+    out = np.where(luma >= hi, 255.0, out)
+    out = np.where(luma <= lo, out * (luma / lo) ** 0.5, out)
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+UPSCALERS = {
+    "bicubic": bicubic,
+    "lanczos": lanczos,
+    "unsharp": unsharp,
+    "text": text_aware,
+}
+
+def is_thread_safe(upscaler):
+    return upscaler in UPSCALERS.values() or getattr(upscaler, "thread_safe", False)
+
+def load_upscaler(name):
+    """Built-in name, or `module:factory` where factory() returns a batch function (e.g. a CPU model)."""
+    if name in UPSCALERS:
+        return UPSCALERS[name]
+    module_name, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown upscaler '{name}' (built-ins: {', '.join(UPSCALERS)}; or module:factory)")
+    return getattr(importlib.import_module(module_name), attr)()
+
+# ---------------------------------------------------------------- tiling
+
+def tile_starts(length, tile, overlap):
+    if length <= tile:
+        return [0]
+    step = tile - overlap
+    starts = list(range(0, length - tile + 1, step))
+    if starts[-1] != length - tile:
+        starts.append(length - tile)
+    return starts
+
+def blend_window(size, ramp):
+    """Separable weights that fade linearly over `ramp` px at every tile edge."""
+    i = np.arange(size, dtype=np.float32)
+    w = np.minimum(i + 1, size - i) / (ramp + 1)
+    w = np.clip(w, 0, 1)
+    return np.outer(w, w)[..., None]
+
+class ImageJob:
+    """Output accumulator for one image while its tiles are in flight."""
+
+    def __init__(self, name, image, scale, tile, overlap):
+        self.name = name
+        self.h, self.w = image.shape[:2]
+        self.acc = np.zeros((self.h * scale, self.w * scale, 3), dtype=np.float32)
+        self.weight = np.zeros((self.h * scale, self.w * scale, 1), dtype=np.float32)
+        self.tiles = []
+        for y in tile_starts(self.h, tile, overlap):
+            for x in tile_starts(self.w, tile, overlap):
+                crop = image[y:y + tile, x:x + tile]
+                # Edge-pad short tiles so every tile in a batch has the same shape
+                pad = ((0, tile - crop.shape[0]), (0, tile - crop.shape[1]), (0, 0))
+                self.tiles.append(((y, x), np.pad(crop, pad, mode="edge")))
+        self.remaining = len(self.tiles)
+
+    def add(self, pos, out, window, scale):
+        y, x = pos[0] * scale, pos[1] * scale
+        hh = min(out.shape[0], self.acc.shape[0] - y)
+        ww = min(out.shape[1], self.acc.shape[1] - x)
+        self.acc[y:y + hh, x:x + ww] += out[:hh, :ww] * window[:hh, :ww]
+        self.weight[y:y + hh, x:x + ww] += window[:hh, :ww]
+        self.remaining -= 1
+
+    def result(self):
+        return np.clip(self.acc / np.maximum(self.weight, 1e-6) + 0.5, 0, 255).astype(np.uint8)
+
+def load_input(path, input_scale):
+    img = Image.open(path).convert("RGB")
+    if input_scale != 1.0:
+        img = img.resize((max(1, round(img.width * input_scale)), max(1, round(img.height * input_scale))), Image.BOX)
+    return np.asarray(img)
+
+def run(upscaler, paths, out_dir, scale=1, tile=256, overlap=16, batch_size=16, threads=4, input_scale=1.0):
+    """Upscale every image in paths into out_dir. Returns (images, input px, output px, seconds)."""
+    window = blend_window(tile * scale, overlap * scale)
+    in_px = out_px = 0
+    pending_saves = []
+    split = is_thread_safe(upscaler)
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        # Decode up to `threads` images ahead on the pool; consume in order
+        loads = deque()
+        path_iter = iter(paths)
+        for p in islice(path_iter, threads):
+            loads.append((p, pool.submit(load_input, p, input_scale)))
+        jobs = []
+        queue = []   # (job, pos, tile) waiting for a batch
+
+        def flush(batch):
+            if not split:
+                # One call per batch so a model sees the full cross-image batch
+                for (job, pos, _), out in zip(batch, upscaler(np.stack([t for _, _, t in batch]), scale)):
+                    job.add(pos, out, window, scale)
+                return
+            # Split the batch over the pool so built-in PIL upscalers use every thread
+            chunks = [batch[i::threads] for i in range(threads) if batch[i::threads]]
+            futures = [pool.submit(upscaler, np.stack([t for _, _, t in chunk]), scale) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                for (job, pos, _), out in zip(chunk, future.result()):
+                    job.add(pos, out, window, scale)
+
+        def finish_done():
+            nonlocal out_px
+            for job in [j for j in jobs if j.remaining == 0]:
+                jobs.remove(job)
+                result = job.result()
+                out_px += result.shape[0] * result.shape[1]
+                pending_saves.append(pool.submit(Image.fromarray(result).save, out_dir / f"{job.name}.png"))
+
+        for _ in tqdm(range(len(paths)), desc="Upscaling"):
+            path, future = loads.popleft()
+            for p in islice(path_iter, 1):
+                loads.append((p, pool.submit(load_input, p, input_scale)))
+            image = future.result()
+            in_px += image.shape[0] * image.shape[1]
+            job = ImageJob(path.stem, image, scale, tile, overlap)
+            jobs.append(job)
+            queue += [(job, pos, t) for pos, t in job.tiles]
+            job.tiles = None
+            while len(queue) >= batch_size:
+                flush(queue[:batch_size])
+                queue = queue[batch_size:]
+                finish_done()
+        if queue:
+            flush(queue)
+            finish_done()
+
+        for f in pending_saves:
+            f.result()
+
+    return len(paths), in_px, out_px, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a baseline or plugged-in upscaler over degraded images to produce --pred_dir for evaluate.py")
+    parser.add_argument("--input_dir", default="./degraded", help="Degraded PNGs")
+    parser.add_argument("--output_dir", default="./pred", help="Where to write upscaled PNGs (same names)")
+    parser.add_argument("--upscaler", default="bicubic",
+                        help=f"One of {', '.join(UPSCALERS)} or module:factory returning a batch function")
+    parser.add_argument("--scale", type=int, default=1, help="Integer upscale factor")
+    parser.add_argument("--input_scale", type=float, default=1.0,
+                        help="Box-downsample inputs first (e.g. 0.5 with --scale 2 for degraded sets at GT size)")
+    parser.add_argument("--tile", type=int, default=256, help="Tile size in input pixels")
+    parser.add_argument("--overlap", type=int, default=16, help="Tile overlap in input pixels, blended linearly")
+    parser.add_argument("--batch_size", type=int, default=16, help="Tiles per batch, gathered across images")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Threads for decode, upscale and save")
+    args = parser.parse_args()
+
+    if args.overlap * 2 >= args.tile:
+        parser.error("--overlap must be less than half of --tile")
+
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = sorted(Path(args.input_dir).glob("*.png"))
+    upscaler = load_upscaler(args.upscaler)
+
+    with get_tracer("upscale").item(args.upscaler, inputs=paths) as ev:
+        n, in_px, out_px, elapsed = run(upscaler, paths, out_dir, args.scale, args.tile, args.overlap,
+                                        args.batch_size, args.threads, args.input_scale)
+        ev.outputs = [out_dir / p.name for p in paths]
+        ev.extra.update(images=n, input_mp=round(in_px / 1e6, 3), output_mp=round(out_px / 1e6, 3))
+    elapsed = max(elapsed, 1e-9)
+    print(f"[OK] {args.upscaler}: {n} images in {elapsed:.1f}s, "
+          f"{in_px / 1e6 / elapsed:.2f} MP/s in, {out_px / 1e6 / elapsed:.2f} MP/s out")
+
+if __name__ == "__main__":
+    main()